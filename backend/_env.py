@@ -0,0 +1,10 @@
+"""
+Loads backend/.env into os.environ once per process.
+
+Importing this module is the only place .env gets parsed; Python caches the module,
+so later imports (and importlib.reload of modules that import it) skip the file read.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -1,49 +1,21 @@
 from flask import Flask, request, jsonify
 import logging
-import re
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, jwt_required
-import bcrypt  # New dependency for password hashing
-from werkzeug.security import check_password_hash  # Legacy verification only
-from database import get_db_connection, init_db
-from datetime import timedelta
+from flask_jwt_extended import JWTManager, jwt_required
+from database import get_db_connection, init_db, prepared_cursor
 import datetime
 import mysql.connector
 import os
+import queue
+import threading
 # Import the new config module
-from config import JWT_SECRET_KEY, JWT_ACCESS_TOKEN_EXPIRES_HOURS, FLASK_DEBUG, FLASK_PORT
+from config import SETTINGS
 # Import the new LangChain RAG implementation
 import langchain_rag
-
-# Password validation function
-def validate_password(password):
-    """
-    Validate password requirements:
-    - At least 1 lowercase letter
-    - At least 1 uppercase letter  
-    - At least 1 digit
-    - At least 1 special character (@$!%*?&#^()[ ]{}_-+=~|:;,.<>)
-    """
-    if not password:
-        return "Password is required"
-    
-    # Check for at least one lowercase letter
-    if not re.search(r'[a-z]', password):
-        return "Password must contain at least one lowercase letter"
-    
-    # Check for at least one uppercase letter
-    if not re.search(r'[A-Z]', password):
-        return "Password must contain at least one uppercase letter"
-    
-    # Check for at least one digit
-    if not re.search(r'\d', password):
-        return "Password must contain at least one digit"
-    
-    # Check for at least one special character
-    if not re.search(r'[@$!%*?&#^()\[\]{}_\-+=~|:;,.<>]', password):
-        return "Password must contain at least one special character (@$!%*?&#^()[ ]{}_-+=~|:;,.<>)"
-    
-    return None  # No validation errors
+from json_provider import ORJSONProvider
+from schemas import BULK_EXPENSE_DECODER, EXPENSE_DECODER, EXPENSE_LIST_ENCODER, ExpenseOut, decode_payload
+# Signup / login / profile routes
+from routes_auth import bp as auth_bp, current_uid
 
 # Logger
 logger = logging.getLogger("api")
@@ -51,164 +23,183 @@ if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
 app = Flask(__name__)
+# Serialize responses with orjson instead of the stdlib json module
+app.json = ORJSONProvider(app)
 # Configure CORS with explicit settings to handle preflight requests
 CORS(app, resources={
     r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization"],
+        # Let browsers cache preflight results for a day instead of re-sending OPTIONS
+        "max_age": 86400
     }
 })
 
 # JWT Configuration from config module
-app.config["JWT_SECRET_KEY"] = JWT_SECRET_KEY
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=JWT_ACCESS_TOKEN_EXPIRES_HOURS)
+app.config["JWT_SECRET_KEY"] = SETTINGS.jwt_secret_key
+app.config["JWT_ACCESS_TOKEN_EXPIRES"] = SETTINGS.jwt_expires_delta
 jwt = JWTManager(app)
 
 # Validate required environment variables
 if not app.config["JWT_SECRET_KEY"]:
     raise ValueError("JWT_SECRET_KEY environment variable is required")
 
-# Initialize DB
-init_db()
-
-# --- Signup ---
-@app.route("/signup", methods=["POST"])
-def signup():
-    data = request.json or {}
-    username = (data.get("username") or '').strip()
-    email = (data.get("email") or '').strip().lower()
-    password = data.get("password") or ''
-
-    if not username or not email or not password:
-        return jsonify({"message": "Missing required fields"}), 400
-
-    # Validate password requirements
-    password_error = validate_password(password)
-    if password_error:
-        return jsonify({"message": password_error}), 400
+app.register_blueprint(auth_bp)
 
-    # Hash password using bcrypt (store as utf-8 string). Legacy users keep PBKDF2 hashes.
-    salt = bcrypt.gensalt(rounds=12)
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+# Initialize DB (development; deployments run migrate.py and set DB_AUTO_INIT=False)
+if SETTINGS.db_auto_init:
+    init_db()
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Check existing user by username OR email (accounting for legacy rows without email)
-        cursor.execute("SELECT * FROM users WHERE username=%s OR email=%s", (username, email))
-        existing = cursor.fetchone()
-        if existing:
-            return jsonify({"message": "User already exists"}), 409
+# Background RAG indexing: embedding a new transaction is slow and the client does
+# not need to wait for it, so add_expense only enqueues the row.
+_index_queue = queue.Queue()
 
-        # Insert with email if column exists; fallback if migration not yet added
+def _index_worker():
+    while True:
+        # A single row from add_expense, or a list of one user's rows from a bulk import
+        item = _index_queue.get()
         try:
-            cursor.execute("INSERT INTO users (username, email, password) VALUES (%s, %s, %s)", (username, email, hashed_password))
-        except mysql.connector.ProgrammingError:
-            # email column absent (very early schema) -> add user without email
-            cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
-        conn.commit()
-        return jsonify({"message": "Signup successful"}), 201
-    except mysql.connector.IntegrityError:
-        return jsonify({"message": "User already exists"}), 409
-    except Exception as e:
-        return jsonify({"message": "Signup failed", "error": str(e)}), 500
-    finally:
-        conn.close()
-
-# --- Login ---
-@app.route("/login", methods=["POST"])
-def login():
-    data = request.json
-    username = data.get("username")
-    password = data.get("password")
-    
-    if not username or not password:
-        logger.warning("Login attempt with missing fields")
-        return jsonify({"message": "Missing required fields"}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE username=%s", (username,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if user:
-        stored_hash = user["password"] or ""
-        valid = False
-        # Detect bcrypt hash prefixes
-        if stored_hash.startswith(("$2a$", "$2b$", "$2y$")):
-            try:
-                valid = bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
-            except ValueError:
-                valid = False
-        else:
-            # Fallback to Werkzeug PBKDF2 check for legacy accounts
-            try:
-                valid = check_password_hash(stored_hash, password)
-            except Exception:
-                valid = False
-
-        if valid:
-            logger.info(f"Login successful for user_id={user['id']} username={user['username']}")
-            access_token = create_access_token(identity=str(user["id"]))
-            return jsonify({
-                "message": "Login successful",
-                "access_token": access_token,
-                "user_id": user["id"],
-                "username": user["username"],
-                "email": user["email"]
-            })
-    logger.warning(f"Invalid login for username={username}")
-    return jsonify({"message": "Invalid credentials"}), 401
+            if isinstance(item, list):
+                ok = langchain_rag.rag_service.add_transactions_to_index(item)
+                logger.info(f"LangChain index update for {len(item)} bulk expenses ok={ok}")
+            else:
+                ok = langchain_rag.rag_service.add_transaction_to_index(item)
+                logger.info(f"LangChain index update for expense_id={item['id']} ok={ok}")
+        except Exception:
+            # Do not let one bad row stop the worker; log to console
+            logger.exception("LangChain RAG indexing error")
+        finally:
+            _index_queue.task_done()
+
+threading.Thread(target=_index_worker, name="rag-indexer", daemon=True).start()
+
+# Pool exhausted: every connection is busy serving another request
+@app.errorhandler(mysql.connector.errors.PoolError)
+def handle_pool_exhausted(e):
+    logger.warning(f"Database pool exhausted: {e}")
+    return jsonify({"message": "Server busy, please retry shortly"}), 503
+
+# Keys of the rows handed to the RAG indexer, in INSERT_EXPENSE_SQL's parameter order after id
+TRANSACTION_ROW_COLS = ("id", "user_id", "date", "category", "note", "amount", "type")
+
+INSERT_EXPENSE_SQL = (
+    "INSERT INTO expenses (user_id, date, category, note, amount, type) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+
+# Edit / delete statements, run as prepared statements like the insert and listing
+EXPENSE_ROW_COLS = ("user_id", "date", "category", "note", "amount", "type")
+EXPENSE_ROW_SQL = "SELECT user_id, date, category, note, amount, type FROM expenses WHERE id=%s"
+UPDATE_EXPENSE_SQL = (
+    "UPDATE expenses SET date=%s, category=%s, note=%s, amount=%s, type=%s "
+    "WHERE id=%s AND user_id=%s"
+)
+DELETE_EXPENSE_SQL = "DELETE FROM expenses WHERE id=%s AND user_id=%s"
+
+def _fetch_expense(conn, expense_id):
+    """The expense row as a dict (EXPENSE_ROW_COLS), or None."""
+    with prepared_cursor(conn, EXPENSE_ROW_SQL) as cursor:
+        cursor.execute(EXPENSE_ROW_SQL, (expense_id,))
+        # At most one row; read to the end so the connection is free for the next statement
+        rows = cursor.fetchall()
+    return dict(zip(EXPENSE_ROW_COLS, rows[0])) if rows else None
 
 # --- Add Expense ---
 @app.route("/add_expense", methods=["POST"])
 @jwt_required()
 def add_expense():
-    # get_jwt_identity returns the string we stored; convert back to int for DB use
-    current_user_id = int(get_jwt_identity())
-    data = request.json
+    current_user_id = current_uid()
+    data, error = decode_payload(EXPENSE_DECODER)
+    if error:
+        return error
     
     # Ensure the expense belongs to the authenticated user
-    if "user_id" in data and int(data["user_id"]) != int(current_user_id):
-        logger.warning(f"Unauthorized add_expense attempt by user_id={current_user_id} for user_id={data.get('user_id')}")
+    if data.user_id is not None and data.user_id != current_user_id:
+        logger.warning(f"Unauthorized add_expense attempt by user_id={current_user_id} for user_id={data.user_id}")
         return jsonify({"message": "Unauthorized to add expense for another user"}), 403
     
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        logger.info(f"Adding expense for user_id={current_user_id} category={data.get('category')} amount={data.get('amount')} type={data.get('type')}")
-        cursor.execute("""
-            INSERT INTO expenses (user_id, date, category, note, amount, type)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (current_user_id, data["date"], data["category"], data["note"], data["amount"], data["type"]))
-        conn.commit()
-        # Fetch the inserted row id and row for FAISS sync
-        expense_id = cursor.lastrowid
-        cursor.execute("SELECT id, user_id, date, category, note, amount, type FROM expenses WHERE id=%s", (expense_id,))
-        row = cursor.fetchone()
+        logger.info(f"Adding expense for user_id={current_user_id} category={data.category} amount={data.amount} type={data.type}")
+        with prepared_cursor(conn, INSERT_EXPENSE_SQL) as cursor:
+            cursor.execute(INSERT_EXPENSE_SQL, (current_user_id, data.date, data.category, data.note, data.amount, data.type))
+            expense_id = cursor.lastrowid
+        # Build the row for FAISS sync from the request; every column is already known
+        row = {
+            "id": expense_id,
+            "user_id": current_user_id,
+            "date": data.date,
+            "category": data.category,
+            "note": data.note,
+            "amount": data.amount,
+            "type": data.type,
+        }
         logger.info(f"Expense inserted id={expense_id}")
         
-        # Update LangChain RAG index
-        try:
-            ok = langchain_rag.rag_service.add_transaction_to_index(row)
-            logger.info(f"LangChain index update for expense_id={expense_id} ok={ok}")
-        except Exception as e:
-            # Do not fail API if indexing fails; log to console
-            logger.exception(f"LangChain RAG indexing error for expense_id={expense_id}")
-            
+        # Update LangChain RAG index in the background; the write is already committed
+        _index_queue.put(row)
+
         return jsonify({"message": "Expense added successfully", "id": expense_id}), 201
     except Exception as e:
         logger.exception("Failed to add expense")
         return jsonify({"message": "Failed to add expense", "error": str(e)}), 400
     finally:
         conn.close()
+# Rows accepted by one bulk request
+BULK_EXPENSE_MAX = 1000
+
+# --- Bulk Add Expenses (CSV import, sync) ---
+@app.route("/expenses/bulk", methods=["POST"])
+@jwt_required()
+def add_expenses_bulk():
+    current_user_id = current_uid()
+    items, error = decode_payload(BULK_EXPENSE_DECODER)
+    if error:
+        return error
+    if not items:
+        return jsonify({"message": "No expenses to add"}), 400
+    if len(items) > BULK_EXPENSE_MAX:
+        return jsonify({"message": f"At most {BULK_EXPENSE_MAX} expenses per request"}), 413
+    if any(item.user_id is not None and item.user_id != current_user_id for item in items):
+        logger.warning(f"Unauthorized bulk add attempt by user_id={current_user_id}")
+        return jsonify({"message": "Unauthorized to add expense for another user"}), 403
+    
+    params = [(current_user_id, e.date, e.category, e.note, e.amount, e.type) for e in items]
+    conn = get_db_connection()
+    try:
+        logger.info(f"Bulk adding {len(params)} expenses for user_id={current_user_id}")
+        # One transaction and one multi-row INSERT (executemany rewrites the VALUES list),
+        # instead of a round-trip and commit per row
+        conn.start_transaction()
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_EXPENSE_SQL, params)
+        # A multi-row INSERT takes one block of AUTO_INCREMENT ids; lastrowid is the first of
+        # them and the rest follow at the server's increment (above 1 under multi-primary
+        # replication, e.g. Group Replication or Galera)
+        first_id = cursor.lastrowid
+        cursor.execute("SELECT @@SESSION.auto_increment_increment")
+        id_step = int(cursor.fetchone()[0])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.exception("Failed to bulk add expenses")
+        return jsonify({"message": "Failed to add expenses", "error": str(e)}), 400
+    finally:
+        conn.close()
+    
+    ids = list(range(first_id, first_id + len(params) * id_step, id_step))
+    rows = [dict(zip(TRANSACTION_ROW_COLS, (expense_id,) + p)) for expense_id, p in zip(ids, params)]
+    # Embedded as one batch in the background; the rows are already committed
+    _index_queue.put(rows)
+    
+    return jsonify({"message": f"{len(ids)} expenses added successfully", "ids": ids}), 201
+
 # --- Legacy RAG Query Endpoint (redirects to LangChain) ---
 @app.route("/chatbot/rag_query", methods=["POST"])
 @jwt_required()
 def rag_query():
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     payload = request.json or {}
     query = (payload.get("query") or "").strip()
     top_k = int(payload.get("top_k", 10))
@@ -234,7 +225,7 @@ def rag_query():
 @app.route("/chatbot/rag_build", methods=["POST"])  # idempotent
 @jwt_required()
 def rag_build():
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     try:
         # Redirect to LangChain implementation
         count = langchain_rag.rag_service.index_user_transactions(
@@ -250,7 +241,7 @@ def rag_build():
 @app.route("/chatbot/langchain/query", methods=["POST"])
 @jwt_required()
 def langchain_rag_query():
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     payload = request.json or {}
     query = (payload.get("query") or "").strip()
     top_k = int(payload.get("top_k", 10))
@@ -280,7 +271,7 @@ def langchain_rag_query():
 @app.route("/chatbot/langchain/build", methods=["POST"])
 @jwt_required()
 def langchain_rag_build():
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     payload = request.json or {}
     reindex = bool(payload.get("reindex", True))  # Default to True for better results
     
@@ -330,7 +321,7 @@ def langchain_rag_stats():
 @jwt_required()
 def langchain_clear_memory():
     """Clear conversation memory for the current user."""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     
     try:
         cleared = langchain_rag.rag_service.clear_conversation_memory(current_user_id)
@@ -359,7 +350,7 @@ def langchain_clear_memory():
 @jwt_required()
 def langchain_get_history():
     """Get conversation history for the current user."""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     
     try:
         history = langchain_rag.rag_service.get_conversation_history(current_user_id)
@@ -380,35 +371,61 @@ def langchain_get_history():
 @app.route("/expenses", methods=["GET"])
 @jwt_required()
 def get_expenses():
-    current_user_id = int(get_jwt_identity())
-    
+    current_user_id = current_uid()
+
+    # Optional keyset pagination: ?limit=N&before=<YYYY-MM-DD>,<id> (the last row of the previous page).
+    # Without limit the full history is returned, which the dashboard totals rely on.
+    # Prepared statement: the server caches the plan and rows come back over the binary protocol.
+    # No client-side %-interpolation happens, so DATE_FORMAT's % signs are written as-is.
+    sql = (
+        "SELECT e.id, DATE_FORMAT(e.date, '%Y-%m-%d') AS date, e.category, e.note, e.amount, e.type "
+        "FROM expenses e WHERE e.user_id=%s"
+    )
+    params = [current_user_id]
+    before = request.args.get("before")
+    if before:
+        try:
+            before_date, before_id = before.split(",", 1)
+            datetime.date.fromisoformat(before_date)
+            params += [before_date, before_date, int(before_id)]
+        except ValueError:
+            return jsonify({"message": "Invalid 'before' cursor, expected <YYYY-MM-DD>,<id>"}), 400
+        sql += " AND (e.date < %s OR (e.date = %s AND e.id < %s))"
+    sql += " ORDER BY e.date DESC, e.id DESC"
+    if request.args.get("limit") is not None:
+        try:
+            limit = max(1, min(int(request.args["limit"]), 500))
+        except ValueError:
+            return jsonify({"message": "Invalid 'limit', expected an integer"}), 400
+        sql += " LIMIT %s"
+        params.append(limit)
+
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM expenses WHERE user_id=%s ORDER BY date DESC", (current_user_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Convert date objects to string for JSON serialization
-    for row in rows:
-        if isinstance(row["date"], datetime.date):
-            row["date"] = row["date"].isoformat()
-    
-    return jsonify(rows)
+    try:
+        with prepared_cursor(conn, sql) as cursor:
+            cursor.execute(sql, tuple(params))
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    # Rows become structs positionally (ExpenseOut follows the SELECT's column order) and are
+    # encoded in one msgspec pass; no per-row dict is built
+    return app.response_class(
+        EXPENSE_LIST_ENCODER.encode([ExpenseOut(*r) for r in rows]), mimetype="application/json"
+    )
 
 # --- Edit Expense ---
 @app.route("/expenses/<int:expense_id>", methods=["PUT"])
 @jwt_required()
 def edit_expense(expense_id):
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     data = request.json or {}
     
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
     
     try:
         # First, verify the expense belongs to the current user
-        cursor.execute("SELECT * FROM expenses WHERE id=%s", (expense_id,))
-        expense = cursor.fetchone()
+        expense = _fetch_expense(conn, expense_id)
         
         if not expense:
             return jsonify({"message": "Transaction not found"}), 404
@@ -425,18 +442,10 @@ def edit_expense(expense_id):
         expense_type = data.get("type", expense["type"])
         
         logger.info(f"Editing expense_id={expense_id} for user_id={current_user_id}")
-        cursor.execute("""
-            UPDATE expenses 
-            SET date=%s, category=%s, note=%s, amount=%s, type=%s
-            WHERE id=%s AND user_id=%s
-        """, (date, category, note, amount, expense_type, expense_id, current_user_id))
-        conn.commit()
+        with prepared_cursor(conn, UPDATE_EXPENSE_SQL) as cursor:
+            cursor.execute(UPDATE_EXPENSE_SQL, (date, category, note, amount, expense_type, expense_id, current_user_id))
         
-        # Fetch updated row for RAG sync
-        cursor.execute("SELECT id, user_id, date, category, note, amount, type FROM expenses WHERE id=%s", (expense_id,))
-        updated_row = cursor.fetchone()
-        
-        # Update LangChain RAG index
+        # Update LangChain RAG index (re-read from the database, so the row isn't fetched here)
         try:
             # Remove old entry and add new one
             langchain_rag.rag_service.rebuild_user_index(current_user_id)
@@ -455,15 +464,13 @@ def edit_expense(expense_id):
 @app.route("/expenses/<int:expense_id>", methods=["DELETE"])
 @jwt_required()
 def delete_expense(expense_id):
-    current_user_id = int(get_jwt_identity())
+    current_user_id = current_uid()
     
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
     
     try:
         # First, verify the expense belongs to the current user
-        cursor.execute("SELECT * FROM expenses WHERE id=%s", (expense_id,))
-        expense = cursor.fetchone()
+        expense = _fetch_expense(conn, expense_id)
         
         if not expense:
             return jsonify({"message": "Transaction not found"}), 404
@@ -474,8 +481,8 @@ def delete_expense(expense_id):
         
         # Delete the expense
         logger.info(f"Deleting expense_id={expense_id} for user_id={current_user_id}")
-        cursor.execute("DELETE FROM expenses WHERE id=%s AND user_id=%s", (expense_id, current_user_id))
-        conn.commit()
+        with prepared_cursor(conn, DELETE_EXPENSE_SQL) as cursor:
+            cursor.execute(DELETE_EXPENSE_SQL, (expense_id, current_user_id))
         
         # Update LangChain RAG index
         try:
@@ -491,26 +498,12 @@ def delete_expense(expense_id):
     finally:
         conn.close()
 
-# --- Get User Info ---
-@app.route("/user", methods=["GET"])
-@jwt_required()
-def get_user_info():
-    current_user_id = int(get_jwt_identity())
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, username, email, created_at FROM users WHERE id=%s", (current_user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-    
-    return jsonify(user)
-
 # --- DEBUG: list users (remove in production) ---
 @app.route("/debug/users")
 def debug_users():
+    # Unauthenticated; only served when FLASK_DEBUG is on
+    if not SETTINGS.flask_debug:
+        return ("", 404)
     conn = get_db_connection()
     c = conn.cursor(dictionary=True)
     try:
@@ -522,10 +515,12 @@ def debug_users():
 # --- DEBUG: RAG status ---
 @app.route("/debug/rag")
 def debug_rag():
+    if not SETTINGS.flask_debug:
+        return ("", 404)
     try:
         stats = langchain_rag.rag_service.get_index_stats()
         return jsonify({
-            "vector_store_present": bool(langchain_rag.rag_service.vector_store is not None),
+            "vector_store_present": stats["total_documents"] > 0,
             "vector_dir": langchain_rag.VECTOR_STORE_DIR if hasattr(langchain_rag, 'VECTOR_STORE_DIR') else "backend/langchain_store",
             "embedding_model": langchain_rag.EMBEDDING_MODEL if hasattr(langchain_rag, 'EMBEDDING_MODEL') else "models/embedding-001",
             "llm_model": langchain_rag.GEMINI_MODEL if hasattr(langchain_rag, 'GEMINI_MODEL') else "gemini-1.5-flash",
@@ -537,4 +532,4 @@ def debug_rag():
 
 if __name__ == "__main__":
     # Use configuration from config module
-    app.run(debug=FLASK_DEBUG, port=FLASK_PORT, use_reloader=False)
+    app.run(debug=SETTINGS.flask_debug, port=SETTINGS.flask_port, use_reloader=False)
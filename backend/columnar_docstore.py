@@ -0,0 +1,175 @@
+"""
+Column-oriented docstore for the transaction FAISS index.
+
+LangChain's InMemoryDocstore keeps one Document per transaction: a page_content string
+plus a metadata dict of seven boxed values. Here each field is one typed column instead
+(array.array for numbers, small vocabularies for the repeating strings), and Documents
+are assembled only when search() asks for one. page_content is not stored at all; it is
+re-rendered from the metadata with the same formatter that produced it at index time.
+"""
+
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+
+class _Vocab:
+    """Distinct values (strings or None) of a column; rows hold a uint32 code into `values`."""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __getstate__(self):
+        # The reverse map is derived; pickle only the values
+        return self.values
+
+    def __setstate__(self, values):
+        self.values = values
+        self._codes = {value: code for code, value in enumerate(values)}
+
+
+class ColumnarDocstore(Docstore, AddableMixin):
+    """Docstore for transaction Documents (metadata from BudgetWiseRAG._create_metadata).
+
+    Args:
+        format_text: Renders a metadata dict back into the indexed page_content. Must be a
+            module-level function so the docstore pickles with FAISS.save_local.
+    """
+
+    def __init__(self, format_text: Callable[[Dict], str]):
+        self._format_text = format_text
+        self._rows: Dict[str, int] = {}  # docstore id -> row; deleted rows are dropped here only
+        self._ids = array("q")
+        self._user_ids = array("q")
+        self._amounts = array("d")  # float64: DECIMAL(10, 2) amounts need more than float32's 7 digits
+        self._dates = array("I")
+        self._types = array("I")
+        self._categories = array("I")
+        self._notes: List[Optional[str]] = []
+        self._date_vocab = _Vocab()
+        self._type_vocab = _Vocab()
+        self._category_vocab = _Vocab()
+        self._transaction_ids = set()  # derived from _ids; not pickled
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_transaction_ids"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._transaction_ids = {self._ids[row] for row in self._rows.values()}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def has_transaction(self, transaction_id: int) -> bool:
+        """Whether a document for this transaction id is stored."""
+        return transaction_id in self._transaction_ids
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Append Documents under their docstore ids (same contract as InMemoryDocstore.add)."""
+        overlapping = set(texts).intersection(self._rows)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        for doc_id, doc in texts.items():
+            get = doc.metadata.get
+            self._rows[doc_id] = len(self._ids)
+            self._ids.append(int(get("id")))
+            self._transaction_ids.add(int(get("id")))
+            self._user_ids.append(int(get("user_id")))
+            self._amounts.append(float(get("amount", 0)))
+            self._dates.append(self._date_vocab.code(str(get("date"))))
+            self._types.append(self._type_vocab.code(get("type")))
+            self._categories.append(self._category_vocab.code(get("category")))
+            self._notes.append(get("note"))
+
+    def delete(self, ids: List) -> None:
+        """Forget ids; their column slots stay allocated until the store is rebuilt."""
+        missing = set(ids).difference(self._rows)
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for doc_id in ids:
+            self._transaction_ids.discard(self._ids[self._rows.pop(doc_id)])
+
+    def _row_metadata(self, row: int) -> Dict:
+        return {
+            "id": self._ids[row],
+            "user_id": self._user_ids[row],
+            "date": self._date_vocab.values[self._dates[row]],
+            "type": self._type_vocab.values[self._types[row]],
+            "category": self._category_vocab.values[self._categories[row]],
+            "amount": self._amounts[row],
+            "note": self._notes[row],
+        }
+
+    def metadata(self, doc_id: str) -> Optional[Dict]:
+        """A fresh metadata dict for doc_id, without rendering page_content."""
+        row = self._rows.get(doc_id)
+        return None if row is None else self._row_metadata(row)
+
+    def columns(self, doc_ids: List[str]) -> Dict[str, list]:
+        """Metadata of several documents as one list per field, in doc_ids order (unknown ids are skipped).
+
+        Each column is gathered in a single pass, so a batch costs one lookup per field
+        rather than one metadata dict per document.
+        """
+        rows = [row for row in map(self._rows.get, doc_ids) if row is not None]
+        dates, types, categories = self._date_vocab.values, self._type_vocab.values, self._category_vocab.values
+        return {
+            "id": [self._ids[row] for row in rows],
+            "user_id": [self._user_ids[row] for row in rows],
+            "date": [dates[self._dates[row]] for row in rows],
+            "type": [types[self._types[row]] for row in rows],
+            "category": [categories[self._categories[row]] for row in rows],
+            "amount": [self._amounts[row] for row in rows],
+            "note": [self._notes[row] for row in rows],
+        }
+
+    def user_id(self, doc_id: str) -> Optional[int]:
+        row = self._rows.get(doc_id)
+        return None if row is None else self._user_ids[row]
+
+    def search(self, search: str) -> Union[str, Document]:
+        metadata = self.metadata(search)
+        if metadata is None:
+            return f"ID {search} not found."
+        return Document(page_content=self._format_text(metadata), metadata=metadata)
+
+    def iter_metadata(self) -> Iterator[Dict]:
+        """Metadata of every stored document, in insertion order."""
+        for row in self._rows.values():
+            yield self._row_metadata(row)
+
+    def _live(self, column: array):
+        """The column's values for stored documents: the array itself unless rows were deleted."""
+        if len(self._rows) == len(self._ids):
+            # Counter walks an array.array in C, with no per-row interpreter step
+            return column
+        return (column[row] for row in self._rows.values())
+
+    def count_by(self, field: str) -> Dict:
+        """Number of stored documents per value of user_id, type or category."""
+        if field == "user_id":
+            return dict(Counter(self._live(self._user_ids)))
+        column, vocab = {
+            "type": (self._types, self._type_vocab),
+            "category": (self._categories, self._category_vocab),
+        }[field]
+        # Counted on the integer codes; each distinct value is decoded once
+        counts = Counter(self._live(column))
+        return {vocab.values[code]: n for code, n in counts.items()}
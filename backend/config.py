@@ -1,49 +1,116 @@
 """
 Configuration module for BudgetWise application.
 Handles environment variables and configuration settings.
+
+Everything is read from the environment once at import and frozen into SETTINGS;
+request handlers read attributes instead of re-querying os.environ.
 """
 
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+import _env  # noqa: F401  # loads .env once
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    # Google API Configuration
+    api_key: Optional[str]
+    api_key_valid: bool
+    # Database Configuration
+    db_host: str
+    db_user: str
+    db_password: Optional[str]
+    db_name: str
+    db_pool_size: int
+    db_pool_reset_session: bool
+    db_use_pure: bool
+    db_auto_init: bool
+    # JWT Configuration
+    jwt_secret_key: Optional[str]
+    jwt_access_token_expires_hours: int
+    jwt_expires_delta: timedelta
+    # Password hashing (Argon2id); memory cost is in KiB
+    argon2_time_cost: int
+    argon2_memory_cost: int
+    argon2_parallelism: int
+    # LangChain RAG Configuration
+    vector_store_dir: str
+    gemini_model: str
+    embedding_model: str
+    embedding_backend: str
+    embedding_device: Optional[str]
+    embedding_fp16: bool
+    embedding_compile: bool
+    faiss_omp_threads: int
+    # Flask Configuration
+    flask_debug: bool
+    flask_port: int
+
+
+def _compute_settings() -> Settings:
+    """Read the environment once and build the frozen Settings."""
+    base_dir = os.path.dirname(__file__)
+    # Prefer GEMINI_API_KEY, fall back to GOOGLE_API_KEY for compatibility
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    index_dir = os.getenv("RAG_INDEX_DIR") or os.path.join(base_dir, "langchain_store")
+    # Ensure absolute path regardless of current working directory
+    if not os.path.isabs(index_dir):
+        index_dir = os.path.abspath(os.path.join(base_dir, index_dir))
+    jwt_expires_hours = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES_HOURS", "24"))
+    return Settings(
+        api_key=api_key,
+        # Set and not the default placeholder
+        api_key_valid=bool(api_key) and api_key != "YOUR_GEMINI_API_KEY_HERE",
+        db_host=os.getenv("DB_HOST", "localhost"),
+        db_user=os.getenv("DB_USER", "root"),
+        db_password=os.getenv("DB_PASSWORD"),
+        db_name=os.getenv("DB_NAME", "budgetwise"),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        # Off so prepared statements outlive a checkout (see database.prepared_cursor); the
+        # app sets no session state that a reset would need to clear
+        db_pool_reset_session=os.getenv("DB_POOL_RESET_SESSION", "False").lower() == "true",
+        # Pure-Python protocol is required under gevent workers (see gunicorn.conf.py)
+        db_use_pure=os.getenv("DB_USE_PURE", "False").lower() == "true",
+        # Run init_db() on app start; deployments use migrate.py and turn this off
+        db_auto_init=os.getenv("DB_AUTO_INIT", "True").lower() == "true",
+        jwt_secret_key=os.getenv("JWT_SECRET_KEY"),
+        jwt_access_token_expires_hours=jwt_expires_hours,
+        jwt_expires_delta=timedelta(hours=jwt_expires_hours),
+        # Defaults follow the OWASP profile; tune per CPU generation
+        argon2_time_cost=int(os.getenv("ARGON2_TIME_COST", "2")),
+        argon2_memory_cost=int(os.getenv("ARGON2_MEMORY_COST", "19456")),
+        argon2_parallelism=int(os.getenv("ARGON2_PARALLELISM", "1")),
+        vector_store_dir=index_dir,
+        gemini_model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+        # Use a local embedding model by default to avoid quota limits
+        embedding_model=os.getenv("EMBEDDING_MODEL", os.getenv("GEMINI_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")),
+        # "torch" (sentence-transformers) or "onnx-int8" (quantized ONNX Runtime, CPU)
+        embedding_backend=os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+        # torch device for the encoder ("cpu", "cuda", "cuda:1", "mps"); unset = auto-detect
+        embedding_device=os.getenv("EMBEDDING_DEVICE") or None,
+        # GPU / MPS only: half-precision weights, and torch.compile (CUDA; adds warm-up on first batch)
+        embedding_fp16=os.getenv("EMBEDDING_FP16", "True").lower() == "true",
+        embedding_compile=os.getenv("EMBEDDING_COMPILE", "True").lower() == "true",
+        # OpenMP threads per FAISS call (index builds, searches); half the cores by default
+        faiss_omp_threads=int(os.getenv("FAISS_OMP_THREADS") or max(1, (os.cpu_count() or 2) // 2)),
+        flask_debug=os.getenv("FLASK_DEBUG", "False").lower() == "true",
+        flask_port=int(os.getenv("FLASK_PORT", "5001")),
+    )
+
+
+SETTINGS = _compute_settings()
+
+# Evaluated once at import; gates should read this instead of calling validate_api_key()
+API_KEY_VALID = SETTINGS.api_key_valid
 
-# Load environment variables
-load_dotenv()
 
-# Google API Configuration
 def get_api_key():
-    """Get the Google API key from environment variables.
-    Prefer GEMINI_API_KEY, fall back to GOOGLE_API_KEY for compatibility.
-    """
-    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    """Get the Google API key resolved at startup."""
+    return SETTINGS.api_key
 
 def validate_api_key():
     """Validate that API key is set and not the default placeholder"""
-    api_key = get_api_key()
-    if not api_key or api_key == "YOUR_GEMINI_API_KEY_HERE":
-        return False
-    return True
-
-# Database Configuration
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "database": os.getenv("DB_NAME")
-}
-
-# JWT Configuration
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-JWT_ACCESS_TOKEN_EXPIRES_HOURS = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES_HOURS", "24"))
-
-# LangChain RAG Configuration
-_default_index_dir = os.path.join(os.path.dirname(__file__), "langchain_store")
-_env_index_dir = os.getenv("RAG_INDEX_DIR", _default_index_dir)
-# Ensure absolute path regardless of current working directory
-VECTOR_STORE_DIR = _env_index_dir if os.path.isabs(_env_index_dir) else os.path.abspath(os.path.join(os.path.dirname(__file__), _env_index_dir))
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-# Use a local embedding model by default to avoid quota limits
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", os.getenv("GEMINI_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
-
-# Flask Configuration
-FLASK_DEBUG = os.getenv("FLASK_DEBUG", "False").lower() == "true"
-FLASK_PORT = int(os.getenv("FLASK_PORT", "5001"))
\ No newline at end of file
+    return API_KEY_VALID
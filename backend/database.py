@@ -1,67 +1,266 @@
+import logging
 import mysql.connector
-import os
-from dotenv import load_dotenv
+from mysql.connector import HAVE_CEXT, pooling
+import threading
+import weakref
+from contextlib import contextmanager
+from config import SETTINGS
 
-# Load environment variables from .env file
-load_dotenv()
+logger = logging.getLogger("database")
+
+# Bump whenever init_db() gains a table, column or index so existing databases re-run it;
+# migrations/NNN_*.sql must end at the same number
+SCHEMA_VERSION = 3
+_INITIALIZED = False
+
+# Shared connection pool, built on first use so importing this module never needs a
+# reachable database. Callers keep using get_db_connection()/conn.close(); close()
+# hands the connection back to the pool.
+# Connections autocommit: endpoints issue single statements, so an explicit COMMIT
+# would only add a round-trip. Multi-statement flows wrap themselves in
+# conn.start_transaction() / conn.commit().
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            # Re-check: another thread may have built it while we waited
+            if _POOL is None:
+                if not SETTINGS.db_use_pure and not HAVE_CEXT:
+                    # use_pure=False silently degrades to the pure-Python protocol parser
+                    logger.warning("mysql-connector C extension not available; falling back to pure Python")
+                _POOL = pooling.MySQLConnectionPool(
+                    pool_name="budgetwise",
+                    pool_size=SETTINGS.db_pool_size,
+                    pool_reset_session=SETTINGS.db_pool_reset_session,
+                    host=SETTINGS.db_host,
+                    user=SETTINGS.db_user,
+                    password=SETTINGS.db_password,
+                    database=SETTINGS.db_name,
+                    autocommit=True,
+                    use_pure=SETTINGS.db_use_pure,
+                )
+    return _POOL
 
 def get_db_connection():
-    conn = mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME", "budgetwise")
-    )
-    return conn
+    """Borrow a connection from the pool, creating the pool on first call.
+
+    A failed pool creation propagates to the caller and is retried on the next call.
+    Raises mysql.connector.errors.PoolError when every connection is in use.
+    """
+    return _get_pool().get_connection()
+
+# Prepared cursors per pooled connection: {connection: (server thread id, {sql: cursor})}.
+# Keyed on the connection under the checkout wrapper, so a statement is prepared once per
+# connection and later checkouts only send the bound parameters. This needs
+# pool_reset_session off (DB_POOL_RESET_SESSION=False): a session reset on check-in
+# deallocates every server-side statement.
+_PREPARED = weakref.WeakKeyDictionary()
+_PREPARED_LOCK = threading.Lock()
+
+@contextmanager
+def prepared_cursor(conn, sql):
+    """Yield a server-side prepared cursor dedicated to sql on this pooled connection.
+
+    The statement is prepared on its first execute on the connection and reused by every
+    later checkout of it. With session resets on, nothing would survive the checkout, so a
+    plain cursor is yielded instead and the statement costs one text-protocol round trip.
+    """
+    if SETTINGS.db_pool_reset_session:
+        yield conn.cursor()
+        return
+    # The pool hands out a fresh PooledMySQLConnection per checkout around the same connection
+    cnx = conn._cnx
+    thread_id = cnx.connection_id
+    with _PREPARED_LOCK:
+        cached = _PREPARED.get(cnx)
+        if cached is None or cached[0] != thread_id:
+            # New connection, or the pool reconnected a dropped one: the server freed the
+            # old session's statements, so its cursors are discarded, not closed
+            cached = _PREPARED[cnx] = (thread_id, {})
+    cursors = cached[1]
+    cursor = cursors.get(sql)
+    if cursor is None:
+        cursor = cursors[sql] = conn.cursor(prepared=True)
+    yield cursor
+
+def monthly_totals(user_id):
+    """Per-month expense totals for a user as [('YYYY-MM', total), ...], oldest first.
+
+    Aggregated in MySQL, so one row per month crosses the wire instead of one per expense.
+    Totals are cast to DOUBLE server-side and arrive as floats, not Decimal objects.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DATE_FORMAT(date, '%Y-%m') AS month, CAST(SUM(amount) AS DOUBLE) "
+            "FROM expenses WHERE user_id=%s AND type='Expense' "
+            "GROUP BY month ORDER BY month",
+            (user_id,),
+        )
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+def monthly_totals_all_users():
+    """Per-month expense totals for every user as [(user_id, 'YYYY-MM', total), ...].
+
+    Ordered by user then month so the rows can be sliced into per-user runs without a sort.
+    Totals arrive as floats (see monthly_totals).
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT user_id, DATE_FORMAT(date, '%Y-%m') AS month, CAST(SUM(amount) AS DOUBLE) "
+            "FROM expenses WHERE type='Expense' "
+            "GROUP BY user_id, month ORDER BY user_id, month"
+        )
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+SCHEMA_DDL = """
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    date DATE,
+    category VARCHAR(255),
+    note TEXT,
+    amount DECIMAL(10,2),
+    type ENUM('Income', 'Expense'),
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+CREATE TABLE IF NOT EXISTS schema_meta (
+    `key` VARCHAR(64) PRIMARY KEY,
+    value VARCHAR(64) NOT NULL
+);
+"""
+
+# Columns added to users after the first release, with the DDL that adds each one.
+# Email is nullable first to avoid failure on existing rows.
+_USERS_ADDED_COLUMNS = {
+    "email": "ALTER TABLE users ADD COLUMN email VARCHAR(255) UNIQUE NULL AFTER username",
+    "created_at": "ALTER TABLE users ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+}
 
 def _migrate_users_table(cursor):
-    """Ensure the users table has expected columns (email, created_at)."""
-    cursor.execute("SHOW TABLES LIKE 'users'")
-    if not cursor.fetchone():
-        # Table does not exist yet; creation handled in init_db
+    """Ensure the users table has expected columns (email, created_at).
+
+    Asks information_schema for just those column names instead of reading the whole
+    table definition with SHOW COLUMNS.
+    """
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='users' AND COLUMN_NAME IN ('email', 'created_at')"
+    )
+    present = {row[0] for row in cursor.fetchall()}
+    for column, ddl in _USERS_ADDED_COLUMNS.items():
+        if column not in present:
+            cursor.execute(ddl)
+
+def _ensure_index(cursor, table, index_name, definition):
+    """Create an index unless one with the same name already exists.
+
+    MySQL has no CREATE INDEX IF NOT EXISTS, so check information_schema first.
+    """
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND INDEX_NAME=%s LIMIT 1",
+        (table, index_name),
+    )
+    if cursor.fetchone():
+        return
+    cursor.execute(f"CREATE INDEX {index_name} ON {table} {definition}")
+
+def _ensure_unique(cursor, table, column, index_name):
+    """Add a UNIQUE key on a column unless a unique index already leads with it."""
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s "
+        "AND NON_UNIQUE=0 AND SEQ_IN_INDEX=1 LIMIT 1",
+        (table, column),
+    )
+    if cursor.fetchone():
         return
-    cursor.execute("SHOW COLUMNS FROM users")
-    existing_cols = {row[0] for row in cursor.fetchall()}
-    # Add email column if missing (nullable first to avoid failure on existing rows)
-    if 'email' not in existing_cols:
-        cursor.execute("ALTER TABLE users ADD COLUMN email VARCHAR(255) UNIQUE NULL AFTER username")
-    # Add created_at if missing
-    if 'created_at' not in existing_cols:
-        cursor.execute("ALTER TABLE users ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD UNIQUE KEY {index_name} ({column})")
+    except mysql.connector.Error as e:
+        # Existing duplicate rows block the key; they must be cleaned up by hand
+        logger.warning(f"Could not add unique key {index_name} on {table}.{column}: {e}")
+
+def read_schema_version(cursor):
+    """Return the recorded schema version, or None before the first versioned init."""
+    try:
+        cursor.execute("SELECT value FROM schema_meta WHERE `key`='schema_version'")
+    except mysql.connector.ProgrammingError:
+        # schema_meta does not exist yet (fresh or pre-versioning database)
+        return None
+    row = cursor.fetchone()
+    return int(row[0]) if row else None
+
+def write_schema_version(cursor, version):
+    """Record the schema version in schema_meta (which must already exist)."""
+    cursor.execute(
+        "INSERT INTO schema_meta (`key`, value) VALUES ('schema_version', %s) "
+        "ON DUPLICATE KEY UPDATE value=%s",
+        (str(version), str(version)),
+    )
 
 def init_db():
+    """Create / migrate the schema once per deploy.
+
+    Development convenience: deployments apply migrations/*.sql with migrate.py and
+    set DB_AUTO_INIT=False. Keep the two in step when bumping SCHEMA_VERSION.
+
+    A schema_meta row records SCHEMA_VERSION after a successful run, so later
+    process starts cost a single SELECT; repeat calls in one process are no-ops.
+    """
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Create Users table if not exists (legacy instances may lack email / created_at)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(255) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL
-        )
-        """
-    )
+    if (read_schema_version(cursor) or 0) >= SCHEMA_VERSION:
+        conn.close()
+        _INITIALIZED = True
+        return
+
+    # All CREATE TABLEs go to the server as one multi-statement batch (one round-trip).
+    # Users is created before expenses because of the foreign key; legacy users tables
+    # may lack email / created_at, which _migrate_users_table() adds below.
+    for _ in cursor.execute(SCHEMA_DDL, multi=True):
+        pass
 
     # Run lightweight migrations to add new columns when upgrading
     _migrate_users_table(cursor)
 
-    # Create Expenses table (add created_at if desired, but remain compatible with existing)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS expenses (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT,
-            date DATE,
-            category VARCHAR(255),
-            note TEXT,
-            amount DECIMAL(10,2),
-            type ENUM('Income', 'Expense'),
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-        """
-    )
+    # Signup relies on these to reject duplicates with a single INSERT
+    _ensure_unique(cursor, "users", "username", "uk_username")
+    _ensure_unique(cursor, "users", "email", "uk_email")
+
+    # Serves the per-user history listing (WHERE user_id ORDER BY date DESC, id DESC) without a filesort,
+    # and per-user date ranges (WHERE user_id AND date BETWEEN ...). InnoDB drops the implicit
+    # index behind the user_id foreign key once this one exists, so writes maintain one less tree.
+    _ensure_index(cursor, "expenses", "idx_expenses_user_date", "(user_id, date DESC, id DESC)")
+
+    # Covers the forecast aggregate (monthly SUM(amount) per user for type='Expense') index-only;
+    # its (user_id, type) prefix serves any per-user type filter, so no separate index is needed
+    _ensure_index(cursor, "expenses", "idx_expenses_user_type_date", "(user_id, type, date, amount)")
+
+    # Record the version so the next start skips everything above
+    write_schema_version(cursor, SCHEMA_VERSION)
 
     conn.commit()
     conn.close()
+    _INITIALIZED = True
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for BudgetWise.
+Run from backend/: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+import _env  # noqa: F401  # loads .env, so settings kept only there apply here too
+
+# Same variable and default as config.SETTINGS.flask_port. config itself is not imported
+# here: SETTINGS is frozen at import, before the gevent DB_USE_PURE default below is set.
+bind = f"0.0.0.0:{os.getenv('FLASK_PORT', '5001')}"
+
+# Threaded workers: Argon2/bcrypt hashing and MySQL I/O release the GIL, so one
+# slow login no longer stalls every other request.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# The RAG vector store lives in process memory, so separate worker processes would
+# each hold (and persist) their own copy. Scale out with threads unless the index is
+# moved out of process; set GUNICORN_WORKERS to e.g. 2*CPU+1 once it is.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+keepalive = 5
+
+# Heartbeat files on tmpfs avoid worker stalls on slow disks (Linux only)
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+if worker_class == "gevent":
+    # gevent only yields on sockets it has monkey-patched, which the mysql-connector
+    # C extension bypasses; use the pure-Python protocol implementation instead.
+    os.environ.setdefault("DB_USE_PURE", "True")
@@ -0,0 +1,38 @@
+"""
+orjson-backed JSON provider for the Flask app.
+Encodes responses in C and writes the bytes straight into the response body.
+"""
+
+import decimal
+
+import orjson
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+# OPT_NON_STR_KEYS: int-keyed dicts (e.g. per-user counts) serialize with string keys,
+# as Flask's stdlib provider did, instead of raising TypeError
+_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(o):
+    """Fallback for types orjson does not know (DECIMAL columns, etc.)."""
+    if isinstance(o, decimal.Decimal):
+        # Same representation Flask's default provider used for DECIMAL amounts
+        return str(o)
+    return DefaultJSONProvider.default(o)
+
+
+class ORJSONProvider(JSONProvider):
+    """Drop-in replacement for Flask's stdlib json provider."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=_OPTIONS),
+            mimetype="application/json",
+        )
@@ -5,31 +5,45 @@ compared to the custom FAISS implementation.
 """
 
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional, Union
+import atexit
+import functools
+import pickle
+import queue
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 import time
 from datetime import datetime
 import logging
 from pathlib import Path
 
-from langchain_google_genai import (
-    ChatGoogleGenerativeAI
-)
+import ahocorasick
+import faiss
+import numpy as np
+from cachetools import LRUCache, TTLCache
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain.chains import RetrievalQA, ConversationalRetrievalChain
-from langchain.prompts import PromptTemplate
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, HumanMessagePromptTemplate
+# langchain_core is loaded by the FAISS wrapper anyway; the heavier langchain.chains /
+# langchain.memory / Gemini client are imported where they are first used
+from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryBufferMemory
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+if TYPE_CHECKING:
+    from langchain.chains import ConversationalRetrievalChain
+    from langchain.memory import ConversationBufferWindowMemory
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Local imports
+from columnar_docstore import ColumnarDocstore
 from database import get_db_connection
-from config import get_api_key, validate_api_key, VECTOR_STORE_DIR, GEMINI_MODEL, EMBEDDING_MODEL
+from config import API_KEY_VALID, SETTINGS
 
 # Configure logging
 logging.basicConfig(
@@ -38,58 +52,884 @@ logging.basicConfig(
 )
 logger = logging.getLogger("langchain_rag")
 
-# Get API key from config
-GEMINI_API_KEY = get_api_key()
+# Settings used throughout this module (resolved once in config)
+GEMINI_API_KEY = SETTINGS.api_key
+VECTOR_STORE_DIR = SETTINGS.vector_store_dir
+GEMINI_MODEL = SETTINGS.gemini_model
+EMBEDDING_MODEL = SETTINGS.embedding_model
+EMBEDDING_BACKEND = SETTINGS.embedding_backend
 
 # Validate API key
-if not validate_api_key():
+if not API_KEY_VALID:
     raise ValueError("Valid GEMINI_API_KEY is required for the LangChain RAG pipeline")
 
+# HF tokenizers spawn their own thread pool; disable it before gunicorn forks workers
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# FAISS's OpenMP pool otherwise takes every core for each call; with several request
+# threads searching at once that oversubscribes the CPU, while bulk builds (HNSW adds,
+# IVF training) still get enough threads to finish quickly
+faiss.omp_set_num_threads(SETTINGS.faiss_omp_threads)
+
 # Ensure the vector store directory exists
 os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
 EMBEDDING_ID_FILE = os.path.join(VECTOR_STORE_DIR, "embedding_model.txt")
+# Per-user / type / category document counts, saved with the shards so get_index_stats
+# doesn't have to open every docstore after a restart
+INDEX_STATS_FILE = os.path.join(VECTOR_STORE_DIR, "index_stats.json")
+# Users whose shard (index + docstore) stays loaded; the least recently used is dropped
+USER_SHARD_CACHE = 32
+
+def _shard_name(user_id: int) -> str:
+    return f"user_{int(user_id)}"
+
+def _shard_paths(user_id: int):
+    """(index, docstore) files FAISS.save_local writes for a user's shard."""
+    base = os.path.join(VECTOR_STORE_DIR, _shard_name(user_id))
+    return base + ".faiss", base + ".pkl"
+
+def _wal_path(user_id: int) -> str:
+    """JSONL log of the user's adds since their shard was last saved."""
+    return os.path.join(VECTOR_STORE_DIR, _shard_name(user_id) + ".wal.jsonl")
+
+_SHARD_FILE_RE = re.compile(r"user_(\d+)\.faiss$")
+
+def _saved_shard_ids() -> List[int]:
+    return [int(m.group(1)) for m in map(_SHARD_FILE_RE.match, os.listdir(VECTOR_STORE_DIR)) if m]
+
+# Bump when the on-disk index stops being compatible (metric, layout); stored next to the
+# embedding model name so a stale index is cleared on load like a model change
+INDEX_FORMAT = "ip-v4"  # v2: typed metadata (int ids, float amounts); v3: columnar docstore; v4: per-user shards
+INDEX_FINGERPRINT = f"{EMBEDDING_MODEL}|{EMBEDDING_BACKEND}|{INDEX_FORMAT}"
+
+# Column order of the transaction SELECT used for indexing
+TRANSACTION_COLS = ("id", "user_id", "date", "category", "note", "amount", "type")
 
 # Out-of-context guard message
+NO_MATCHES_MESSAGE = "I couldn't find any relevant transactions to answer your question. Try rephrasing or ask about different transactions."
+
 OOC_MESSAGE = "Hey, I'm your finance buddy! I can only help with questions about your spending, income, budgets, and financial insights. Ask me anything money-related! 💰"
 
 # LangChain embeddings - switch to local HuggingFace to avoid API quotas
-logger.info(f"Using embedding model={EMBEDDING_MODEL} (HuggingFace) gemini_model={GEMINI_MODEL} index_dir={VECTOR_STORE_DIR}")
-_device = "mps"
+logger.info(f"Using embedding model={EMBEDDING_MODEL} (HuggingFace, {EMBEDDING_BACKEND}) gemini_model={GEMINI_MODEL} index_dir={VECTOR_STORE_DIR}")
+
+@functools.lru_cache(maxsize=1)
+def _embedding_device() -> str:
+    """EMBEDDING_DEVICE if set, else the best available of cuda > mps > cpu (probed once)."""
+    if SETTINGS.embedding_device:
+        return SETTINGS.embedding_device
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    logger.warning("No CUDA or MPS device available; using CPU for embeddings")
+    return "cpu"
+
+def _accelerate_encoder(embedder, device: str):
+    """fp16 weights on GPU/MPS and torch.compile of the transformer on CUDA.
+
+    Both are best-effort: any failure leaves the fp32 eager model in place.
+    """
+    kind = device.split(":")[0]  # "cuda:1" -> "cuda"
+    if kind not in ("cuda", "mps"):
+        return
+    model = embedder.client  # the underlying SentenceTransformer
+    if SETTINGS.embedding_fp16:
+        try:
+            model.half()
+            logger.info(f"Embedding model cast to fp16 on {device}")
+        except Exception as e:
+            logger.warning(f"fp16 cast failed, keeping fp32: {e}")
+    # Inductor targets CUDA; on MPS compilation mostly falls back and only adds warm-up
+    if SETTINGS.embedding_compile and kind == "cuda":
+        try:
+            import torch
+            transformer = model[0]
+            # Compile the HF module the Transformer layer calls, so SentenceTransformer.encode
+            # keeps its batching/pooling and only the forward pass is compiled
+            transformer.auto_model = torch.compile(transformer.auto_model, dynamic=True)
+            logger.info("Embedding transformer compiled with torch.compile")
+        except Exception as e:
+            logger.warning(f"torch.compile failed, using eager model: {e}")
+
+# Texts per encoder forward pass. CPU throughput flattens out around 64; a GPU needs
+# larger batches to fill its cores, and 256 matches INDEX_FETCH_SIZE, so each streamed
+# chunk of an index build is one pass
+EMBED_BATCH_SIZE = 64
+EMBED_BATCH_SIZE_GPU = 256
+
+@functools.lru_cache(maxsize=1)
+def get_embedder():
+    """Build the HuggingFace embedding model on first use.
+
+    Loading torch and the model weights costs seconds and hundreds of MB, so workers
+    that never serve a RAG request never pay for it.
+    """
+    if EMBEDDING_BACKEND == "onnx-int8":
+        # Int8 ONNX Runtime encoder: same vectors up to quantization error, faster on CPU
+        from onnx_embeddings import ONNXInt8Embeddings
+        return ONNXInt8Embeddings(
+            EMBEDDING_MODEL, cache_dir=os.path.join(VECTOR_STORE_DIR, "onnx"), batch_size=EMBED_BATCH_SIZE
+        )
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    device = _embedding_device()
+    batch_size = EMBED_BATCH_SIZE_GPU if device.startswith("cuda") else EMBED_BATCH_SIZE
+    embedder = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": device},
+        # Uniform batches; embed_sorted() orders texts so each batch pads little
+        encode_kwargs={"normalize_embeddings": True, "batch_size": batch_size}
+    )
+    logger.info(f"HF embeddings device={device} batch_size={batch_size}")
+    _accelerate_encoder(embedder, device)
+    return embedder
+
+def embed_sorted(texts: List[str]) -> List[List[float]]:
+    """embed_documents() with each distinct text encoded once, shortest first, returned in input order.
+
+    Each encoder batch pads to its longest text; grouping similar lengths keeps notes of
+    very different sizes from padding each other out. Repeated strings (same category and
+    amount with an empty or stock note) share one forward pass.
+    """
+    if len(texts) <= 1:
+        return get_embedder().embed_documents(texts)
+    # dict keeps first-seen order, so the stable sort below matches the old ordering
+    unique = sorted(dict.fromkeys(texts), key=len)
+    encoded = dict(zip(unique, get_embedder().embed_documents(unique)))
+    return [encoded[t] for t in texts]
+
+# Query embeddings requested while the encoder is busy are encoded together on its next
+# pass (at most this many); a lone request is encoded at once, with no batching delay
+QUERY_BATCH_MAX = 32
+
+class QueryEmbeddingBatcher:
+    """Coalesces embed_query calls from concurrent request threads into embed_documents batches.
+
+    Queries are embedded with the document path (same model, same normalization), which is
+    what embed_query does for both encoder backends.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        return future.result()
+
+    def _ensure_worker(self):
+        # Started on first use, so a gunicorn worker gets its own thread after the fork
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="query-embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Everything that queued up behind the previous encoder pass
+            while len(batch) < QUERY_BATCH_MAX:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, np.asarray(get_embedder().embed_documents(texts), dtype=np.float32)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            if len(batch) > 1:
+                logger.debug(f"Embedded {len(batch)} concurrent queries in one batch")
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+# FAISS index layout. Embeddings are L2-normalized, so inner product is cosine similarity:
+# scores read as similarity (higher is better) and skip L2's extra subtract per dimension.
+# An HNSW graph answers a query by walking O(log N) neighbours
+# instead of scanning every stored transaction like LangChain's default IndexFlatL2.
+# Its vectors are stored as float16 (SQfp16): half the bytes per distance computation and
+# on disk, no training pass (live adds can start a store), and a rounding error far below
+# the score gaps between transactions.
+HNSW_M = 32                 # graph degree
+HNSW_EF_CONSTRUCTION = 200  # build-time candidate list; higher = better graph, slower adds
+HNSW_EF_SEARCH = 64         # query-time candidate list; recall/latency knob
+HNSW_FACTORY = f"HNSW{HNSW_M},SQfp16"
+
+# Large stores are built as IVF + product quantization instead: each vector is stored as
+# PQ_M one-byte codes (32 B instead of 4*dim B) and a query only visits IVF_NPROBE lists.
+# k-means needs ~39 training points per centroid, so smaller batches stay on HNSW.
+IVF_NLIST = 256
+PQ_M = 32
+IVF_PQ_FACTORY = f"IVF{IVF_NLIST},PQ{PQ_M}x8"
+IVF_MIN_TRAIN = IVF_NLIST * 39
+IVF_NPROBE = 8
+
+def _new_faiss_index(vectors: np.ndarray):
+    """Pick and prepare an index for the initial batch of vectors (trained if needed)."""
+    count, dim = vectors.shape
+    if count >= IVF_MIN_TRAIN and dim % PQ_M == 0:
+        index = faiss.index_factory(dim, IVF_PQ_FACTORY, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        return index
+    index = faiss.index_factory(dim, HNSW_FACTORY, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+def _promote_to_ivf(index):
+    """IVF-PQ rebuild of an HNSW index that has grown past IVF_MIN_TRAIN, else None.
+
+    Stores start on HNSW whenever their first batch is small (streamed builds, live adds)
+    and would otherwise stay there. HNSW storage keeps the vectors (float16, or float32 in
+    shards saved before SQfp16), so they are reconstructed, used to train the quantizers
+    and re-added in row order: FAISS row ids, and with them index_to_docstore_id, are
+    unchanged.
+    """
+    if not hasattr(index, "hnsw") or index.ntotal < IVF_MIN_TRAIN or index.d % PQ_M:
+        return None
+    vectors = index.reconstruct_n(0, index.ntotal)
+    ivf = _new_faiss_index(vectors)
+    ivf.add(vectors)
+    return ivf
+
+def _configure_search(vector_store: FAISS) -> FAISS:
+    """Apply query-time parameters (not all are persisted with the index)."""
+    index = vector_store.index
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    if hasattr(index, "nprobe"):
+        index.nprobe = IVF_NPROBE
+    return vector_store
+
+@functools.lru_cache(maxsize=1)
+def _gpu_resources():
+    """Shared faiss GPU resources, or None without a faiss-gpu build and a visible CUDA device."""
+    if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+        return None
+    return faiss.StandardGpuResources()
+
+def _to_gpu(index):
+    """GPU copy of an IVF index for searching, or None where faiss has no GPU version (HNSW)."""
+    res = _gpu_resources()
+    if res is None or not hasattr(index, "nprobe"):
+        return None
+    gpu_index = faiss.index_cpu_to_gpu(res, 0, index)
+    gpu_index.nprobe = IVF_NPROBE
+    return gpu_index
+
+def _transaction_text(transaction: Dict) -> str:
+    """Format a transaction into a standardized string representation."""
+    get = transaction.get
+    return (
+        f"Transaction ID: {get('id')} | "
+        f"User: {get('user_id')} | "
+        f"Date: {get('date', 'unknown_date')} | "
+        f"Type: {get('type', 'unknown_type')} | "
+        f"Category: {get('category', 'uncategorized')} | "
+        f"Amount: ₹{float(get('amount', 0)):.2f} | "
+        f"Note: {get('note', '')}"
+    )
+
+def _vector_store_from_embeddings(texts: List[str], vectors: List[List[float]], metadatas: List[Dict],
+                                  docstore=None) -> FAISS:
+    """Create a FAISS store on our own index type and add pre-computed embeddings.
+
+    Transaction stores (the default) keep their metadata in a ColumnarDocstore, which
+    re-renders page_content with _transaction_text instead of storing it.
+    """
+    vector_store = FAISS(
+        embedding_function=get_embedder(),
+        index=_new_faiss_index(np.asarray(vectors, dtype=np.float32)),
+        docstore=docstore if docstore is not None else ColumnarDocstore(_transaction_text),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+    vector_store.add_embeddings(text_embeddings=list(zip(texts, vectors)), metadatas=metadatas)
+    return _configure_search(vector_store)
+
+def _vector_store_from_documents(documents: List[Document]) -> FAISS:
+    # Arbitrary documents: keep them verbatim
+    texts = [doc.page_content for doc in documents]
+    vectors = embed_sorted(texts)
+    return _vector_store_from_embeddings(
+        texts, vectors, [doc.metadata for doc in documents], docstore=InMemoryDocstore()
+    )
+
+def _append_embeddings(store: Optional[FAISS], texts: List[str], vectors: List[List[float]],
+                       metadatas: List[Dict]) -> FAISS:
+    """Add pre-computed embeddings to store, creating it (on our index type) when it is None."""
+    if store is None:
+        return _vector_store_from_embeddings(texts, vectors, metadatas)
+    store.add_embeddings(text_embeddings=list(zip(texts, vectors)), metadatas=metadatas)
+    return store
+
+# Out-of-scope guard vocabulary, matched as substrings of the lower-cased query
+_RELEVANCE_TERMS = (
+    # Core finance and app domain keywords/phrases
+    "expense", "expenses", "spend", "spent", "spending",
+    "income", "earn", "earned", "salary", "wage", "paycheck",
+    "budget", "savings", "save", "balance",
+    "transaction", "transactions", "category", "categories",
+    "rent", "food", "grocery", "groceries", "entertainment",
+    "subscription", "subscriptions", "utilities", "electricity",
+    "water", "gas", "fuel", "transport", "travel", "restaurant",
+    "coffee", "bill", "bills", "due",
+    "trend", "average", "total", "sum", "breakdown", "insight", "insights",
+    "forecast", "recommendation", "recommendations",
+    # time words and months to catch queries like "food in August"
+    "daily", "weekly", "monthly", "yearly", "quarter",
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+    # Money patterns
+    "$", "usd", "dollar", "dollars",
+    # Common question forms tied to quantities/totals
+    "how much", "how many", "what is my", "show me", "compare",
+    "list my", "sum of", "total of", "spending on", "income from",
+)
+
+# One pass over the query for all terms (an Aho-Corasick automaton), instead of a
+# substring test per term
+_RELEVANCE_AUTOMATON = ahocorasick.Automaton()
+for _term in _RELEVANCE_TERMS:
+    _RELEVANCE_AUTOMATON.add_word(_term, _term)
+_RELEVANCE_AUTOMATON.make_automaton()
+
+def _mentions_finance(text: str) -> bool:
+    for _ in _RELEVANCE_AUTOMATON.iter(text):
+        return True
+    return False
+
+# Verdicts per raw query: the guard runs in both query_with_rag and generate_answer, and
+# popular questions repeat across users
+@functools.lru_cache(maxsize=4096)
+def _query_in_scope(query: str) -> bool:
+    return _mentions_finance(query.lower())
+
+# Semantic answer cache: a first-turn question whose embedding is this close to one the
+# same user asked recently reuses that answer, skipping retrieval and the LLM call. A
+# verbatim repeat (same words after normalizing case and spacing) is found before the
+# question is even embedded.
+ANSWER_CACHE_THRESHOLD = 0.95   # cosine similarity
+ANSWER_CACHE_TTL = 600          # seconds
+ANSWER_CACHE_USERS = 1024
+ANSWER_CACHE_PER_USER = 16
+
+# Prefix of generate_answer's failure reply; such answers are never cached
+ANSWER_ERROR_PREFIX = "I had trouble analyzing your transactions."
+
+# SimSIMD (optional) scores the cache's few vectors with SIMD kernels directly, skipping
+# NumPy's BLAS dispatch and output allocation that dominate at this size
 try:
-    import torch
-    if not (hasattr(torch, "mps") and torch.backends.mps.is_available()):
-        _device = "cpu"
-        logger.warning("MPS not available; falling back to CPU for embeddings")
-except Exception:
-    _device = "mps"  # best-effort, SentenceTransformer will error if unsupported
-
-embeddings = HuggingFaceEmbeddings(
-    model_name=EMBEDDING_MODEL,
-    model_kwargs={"device": _device},
-    encode_kwargs={"normalize_embeddings": True}
+    import simsimd
+except ImportError:
+    simsimd = None
+
+def _cosine_scores(query_vector: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarity of query_vector with each row of the float32 matrix vectors."""
+    if simsimd is not None:
+        return 1.0 - np.asarray(simsimd.cdist(query_vector[None, :], vectors, metric="cosine"))[0]
+    # Embeddings are L2-normalized, so the inner product is the cosine
+    return vectors @ query_vector
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+class SemanticAnswerCache:
+    """Recent RAG results per user, looked up by exact question or query-embedding similarity."""
+
+    def __init__(self):
+        # user_id -> ([(normalized query, top_k), ...], (n, dim) float32 query vectors, [result, ...]),
+        # oldest first. The vectors are one contiguous matrix so a lookup is a single
+        # matrix-vector product; put() builds a new entry rather than growing the old one, so
+        # lookups can score a snapshot without holding the lock. The TTL runs from the user's
+        # latest insert, and invalidate() drops a user whose data changed.
+        self._entries = TTLCache(maxsize=ANSWER_CACHE_USERS, ttl=ANSWER_CACHE_TTL)
+        self._lock = threading.Lock()
+
+    def get_exact(self, user_id: int, query: str, top_k: int) -> Optional[Dict]:
+        """A cached result for this same question, without needing its embedding."""
+        key = (_normalize_query(query), top_k)
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        keys, _, results = entry
+        for i in range(len(keys) - 1, -1, -1):
+            if keys[i] == key:
+                return results[i]
+        return None
+
+    def get(self, user_id: int, query_vector: np.ndarray, top_k: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        keys, vectors, results = entry
+        scores = _cosine_scores(query_vector, vectors)
+        best = max(
+            (i for i, (_, k) in enumerate(keys) if k == top_k),
+            key=scores.__getitem__, default=None,
+        )
+        if best is None or scores[best] < ANSWER_CACHE_THRESHOLD:
+            return None
+        return results[best]
+
+    def put(self, user_id: int, query: str, top_k: int, query_vector: np.ndarray, result: Dict):
+        keep = ANSWER_CACHE_PER_USER - 1
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                keys, vectors, results = [], np.empty((0, query_vector.shape[0]), dtype=np.float32), []
+            else:
+                keys, vectors, results = entry
+            self._entries[user_id] = (
+                keys[-keep:] + [(_normalize_query(query), top_k)],
+                np.vstack((vectors[-keep:], query_vector[None, :])).astype(np.float32, copy=False),
+                results[-keep:] + [result],
+            )
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+# Conversational prompt with memory context
+CONDENSE_QUESTION_PROMPT = PromptTemplate(
+    template="""Based on our conversation so far and this new question, what is the user really asking about?
+
+Previous conversation:
+{chat_history}
+
+New question: {question}
+
+Rephrased as a clear, standalone question:""",
+    input_variables=["chat_history", "question"]
 )
-logger.info(f"HF embeddings device={_device}")
 
-# Chunking configuration
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=100,
-    length_function=len,
+# Main QA prompt with conversation awareness
+CONVERSATION_QA_PROMPT = PromptTemplate(
+    template="""
+You're a friendly, casual financial buddy helping someone understand their money habits. You remember what you've talked about before.
+
+CRITICAL RULES:
+1. If they ask about anything OTHER than money, spending, income, budgets, or savings → respond with ONLY: """ + OOC_MESSAGE + """
+2. Otherwise, help them understand their finances in a natural, friendly way.
+
+HOW TO RESPOND:
+- Talk like a real person, not a robot
+- Reference earlier parts of the conversation naturally (e.g., "Like I mentioned...", "Remember when we talked about...", "Compared to that...")
+- Get straight to the point - no "Based on the data" or "According to the transactions"
+- Use actual numbers and be specific
+- Highlight important amounts in **bold**
+- Share insights if you notice patterns
+- Keep it friendly and conversational - 2-3 short paragraphs max
+- If they ask follow-ups like "what about X?" or "how much on Y?", understand they're continuing the conversation
+
+Here are their relevant transactions:
+{context}
+
+Their question: {question}
+
+Your response:""",
+    input_variables=["context", "question"]
+)
+
+# Fallback path (no chain): the system turn never changes, so it is built once and shared
+FALLBACK_SYSTEM_MESSAGE = SystemMessage(content=(
+    "You're a friendly financial buddy who remembers conversations. "
+    "Talk naturally - no robotic phrases like 'Based on the data' or 'According to'. "
+    "Just answer directly like a helpful friend would. Use specific numbers and dates. "
+    "Reference what you talked about before when relevant. "
+    "Bold important amounts. Keep it casual and conversational. "
+    "If they ask about non-financial stuff, only say: " + OOC_MESSAGE
+))
+FALLBACK_QUESTION_TEMPLATE = "My question is: {query}\n\nHere are my relevant transactions:\n{context}"
+# One context line per match (keys of get_relevant_transactions' dicts; amount is a float)
+FALLBACK_CONTEXT_LINE = (
+    "Transaction ID: {id} | User: {user_id} | Date: {date} | Type: {type} | "
+    "Category: {category} | Amount: ₹{amount:.2f} | Note: {note}"
 )
 
+# Rows fetched (and embedded) per chunk when indexing a user's history
+INDEX_FETCH_SIZE = 256
+
+# Query embeddings kept for repeated questions (~1.5 KB each at 384 dims)
+QUERY_EMBED_CACHE_SIZE = 10_000
+
+# Live adds are appended to the shard's write-ahead log right away and the shard itself
+# is rewritten only once it has INDEX_FLUSH_PENDING unsaved adds or its oldest one is
+# INDEX_FLUSH_MAX_AGE seconds old; the flush thread checks every INDEX_FLUSH_INTERVAL
+INDEX_FLUSH_INTERVAL = 5
+INDEX_FLUSH_PENDING = 256
+INDEX_FLUSH_MAX_AGE = 60
+
+class UserTransactionRetriever(BaseRetriever):
+    """Chain retriever over one user's transactions, backed by get_relevant_transactions.
+
+    Searches only the user's FAISS rows, and reuses the query embedding query_with_rag
+    already computed for the turn instead of encoding the question a second time.
+    """
+
+    rag: Any
+    user_id: int
+    k: int = 12
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        rag = self.rag
+        query_vector = rag._turn_query_vector(self.user_id, query)
+        return [
+            Document(page_content=rag._format_transaction(tx), metadata=tx)
+            for tx in rag.get_relevant_transactions(self.user_id, query, self.k, query_vector=query_vector)
+        ]
+
+class _UserShard:
+    """One user's FAISS store plus its persistence state."""
+
+    __slots__ = ("store", "mapped", "pending", "dirty_since")
+
+    def __init__(self, store: Optional[FAISS], mapped: bool = False):
+        self.store = store
+        self.mapped = mapped      # index memory-mapped read-only from the shard file
+        self.pending = 0          # adds not yet in the shard files (only in its WAL)
+        self.dirty_since = 0.0
+
+    @property
+    def dirty(self) -> bool:
+        return self.pending > 0
+
+    def mark_dirty(self, count: int):
+        if not self.pending:
+            self.dirty_since = time.time()
+        self.pending += count
+
 class BudgetWiseRAG:
     """LangChain-based RAG for BudgetWise financial data."""
     
     def __init__(self):
-        self.vector_store = None
-        self._load_vector_store()
+        # One FAISS store per user (VECTOR_STORE_DIR/user_<id>.faiss + .pkl), loaded on first
+        # use and kept in an LRU of USER_SHARD_CACHE users; a search only touches its user's
+        # vectors and a reindex only re-embeds that user's transactions
+        self._shards = OrderedDict()  # user_id -> _UserShard, most recently used last
+        self._fingerprint_checked = False
+        # Document counts behind get_index_stats, kept current as shards change (read from
+        # INDEX_STATS_FILE, or rebuilt by one pass over the shards, when the directory is opened)
+        self._user_counts = Counter()
+        self._type_counts = Counter()
+        self._category_counts = Counter()
+        self._counts_stale = False
+        # Search-only GPU copies of IVF shard indexes (faiss-gpu + CUDA). The CPU index stays
+        # the one that is added to and saved; a copy is re-uploaded once it falls behind.
+        self._gpu_indexes = {}  # user_id -> (key, gpu index or None)
+        self._gpu_lock = threading.Lock()
+        self._gpu_enabled = _gpu_resources() is not None
+        self._answer_cache = SemanticAnswerCache()
+        # Chat model and per-user conversation chains, built on first use
+        self._chat_llm = None
+        self._chains = {}  # user_id -> (memory, chain)
+        self._chains_lock = threading.Lock()
+        # (user_id, query, vector) embedded by the request running on this thread
+        self._turn = threading.local()
+        # Runs query_with_rag's match search while the request thread waits on the LLM
+        self._retrieval_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-retrieval")
+        # Embedding text -> float32 query vector (shared, never modified); repeats skip the encoder
+        self._embed_cache = LRUCache(maxsize=QUERY_EMBED_CACHE_SIZE)
+        self._embed_cache_lock = threading.Lock()
+        self._query_batcher = QueryEmbeddingBatcher()
+        # Guards the shard map and every shard mutation / save. Write-behind persistence:
+        # live adds go to the shard and its WAL, and a background thread rewrites the
+        # shard files in batches (see INDEX_FLUSH_PENDING / INDEX_FLUSH_MAX_AGE)
+        self._save_lock = threading.RLock()
+        # Live adds made while a reindex of the user runs, one list per running reindex
+        # (user_id -> [[(text, metadata, vector), ...], ...]); replayed onto the rebuilt shard
+        self._reindex_pending: Dict[int, List[List[Tuple[str, Dict, List[float]]]]] = {}
+        self._stop_flush = threading.Event()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="rag-index-flush", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.close)
         # Store conversation memory per user session
         self.conversation_memories = {}  # user_id -> memory object
 
+    # -------------------------------
+    # Per-user shards
+    # -------------------------------
+    def _shard(self, user_id: int) -> _UserShard:
+        """The user's shard, loaded from disk (or empty) on first use. Callers hold _save_lock."""
+        user_id = int(user_id)
+        shard = self._shards.get(user_id)
+        if shard is not None:
+            self._shards.move_to_end(user_id)
+            return shard
+        self._open_store_dir()
+        shard = self._load_shard(user_id)
+        self._shards[user_id] = shard
+        if (len(shard.store.docstore) if shard.store is not None else 0) != self._user_counts.get(user_id, 0):
+            # Saved counts don't match the shard (e.g. adds lost in a crash before the flush)
+            self._counts_stale = True
+        while len(self._shards) > USER_SHARD_CACHE:
+            evicted_id, evicted = self._shards.popitem(last=False)
+            if evicted.dirty:
+                self._save_shard(evicted_id, evicted)
+            with self._gpu_lock:
+                self._gpu_indexes.pop(evicted_id, None)
+        return shard
+
+    def _open_store_dir(self):
+        """Validate VECTOR_STORE_DIR and load the document counts once. Callers hold _save_lock."""
+        if not self._fingerprint_checked:
+            self._check_fingerprint()
+            self._load_counts()
+
+    def _user_store(self, user_id: int) -> Optional[FAISS]:
+        """The user's FAISS store, or None if they have nothing indexed."""
+        with self._save_lock:
+            return self._shard(user_id).store
+
+    def _set_store(self, user_id: int, shard: _UserShard, store: Optional[FAISS]):
+        """Replace a shard's store (rebuild / first batch); drops its mapping and GPU copy."""
+        shard.store = store
+        shard.mapped = False
+        with self._gpu_lock:
+            self._gpu_indexes.pop(int(user_id), None)
+
+    def _ensure_writable(self, user_id: int, shard: _UserShard):
+        """Swap a memory-mapped (read-only) index for an in-memory copy before it is changed.
+
+        Callers hold _save_lock.
+        """
+        if shard.mapped and shard.store is not None:
+            logger.info(f"Reading FAISS index for user_id={user_id} into memory for writing")
+            shard.store.index = faiss.read_index(_shard_paths(user_id)[0])
+            _configure_search(shard.store)
+            shard.mapped = False
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    def _save_shard(self, user_id: int, shard: _UserShard):
+        """Write one user's shard (or remove its files if it is empty). Callers hold _save_lock."""
+        if shard.store is None:
+            for path in _shard_paths(user_id) + (_wal_path(user_id),):
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            # Written aside and renamed over the shard: truncating the file in place would
+            # pull the pages out from under a memory-mapped index still being searched
+            tmp_name = _shard_name(user_id) + ".tmp"
+            shard.store.save_local(VECTOR_STORE_DIR, index_name=tmp_name)
+            for ext, path in zip((".faiss", ".pkl"), _shard_paths(user_id)):
+                os.replace(os.path.join(VECTOR_STORE_DIR, tmp_name + ext), path)
+            # Everything the log held is in the shard files now
+            if os.path.exists(_wal_path(user_id)):
+                os.remove(_wal_path(user_id))
+            # Persist embedding model fingerprint
+            try:
+                with open(EMBEDDING_ID_FILE, "w") as f:
+                    f.write(INDEX_FINGERPRINT)
+            except Exception as e:
+                logger.warning(f"Failed writing embedding fingerprint: {e}")
+        shard.pending = 0
+        self._save_counts()
+
+    # -------------------------------
+    # Index statistics
+    # -------------------------------
+    def _update_counts(self, user_id: int, documents: int, types: Dict, categories: Dict, sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) documents from the counters. Callers hold _save_lock."""
+        for counter, delta in (
+            (self._user_counts, {user_id: documents}),
+            (self._type_counts, types),
+            (self._category_counts, categories),
+        ):
+            for key, n in delta.items():
+                if not key:
+                    continue
+                counter[key] += sign * n
+                if counter[key] <= 0:
+                    del counter[key]
+
+    def _count_metadatas(self, user_id: int, metadatas: List[Dict]):
+        """Count documents just appended to a user's shard."""
+        self._update_counts(
+            user_id, len(metadatas),
+            Counter(m["type"] for m in metadatas),
+            Counter(m["category"] for m in metadatas),
+        )
+
+    def _count_store(self, user_id: int, store: Optional[FAISS], sign: int = 1):
+        """Count (or uncount) a whole shard, e.g. when a reindex swaps it out."""
+        if store is not None:
+            docstore = store.docstore
+            self._update_counts(user_id, len(docstore), docstore.count_by("type"), docstore.count_by("category"), sign)
+
+    def _rescan_counts(self):
+        """Rebuild the counters from every shard's docstore. Callers hold _save_lock."""
+        logger.info("Recounting indexed documents from the saved shards")
+        self._user_counts.clear()
+        self._type_counts.clear()
+        self._category_counts.clear()
+        user_ids = set(_saved_shard_ids()).union(self._shards)
+        for user_id in user_ids:
+            shard = self._shards.get(user_id)
+            if shard is not None:
+                docstore = shard.store.docstore if shard.store is not None else None
+            else:
+                # Only the docstore half of an unloaded shard is read
+                try:
+                    with open(_shard_paths(user_id)[1], "rb") as f:
+                        docstore = pickle.load(f)[0]
+                except OSError:
+                    continue
+            if docstore is not None:
+                self._update_counts(user_id, len(docstore), docstore.count_by("type"), docstore.count_by("category"))
+        self._counts_stale = False
+        self._save_counts()
+
+    def _load_counts(self):
+        """Read INDEX_STATS_FILE, falling back to a rescan if it is missing or out of date."""
+        try:
+            with open(INDEX_STATS_FILE, "r") as f:
+                saved = json.load(f)
+            users = {int(user_id): n for user_id, n in saved["users"].items()}
+            # Written for this index format and covering exactly the shards on disk
+            if saved.get("fingerprint") == INDEX_FINGERPRINT and set(users) == set(_saved_shard_ids()):
+                self._user_counts = Counter(users)
+                self._type_counts = Counter(saved["document_types"])
+                self._category_counts = Counter(saved["categories"])
+                return
+        except (OSError, ValueError, KeyError) as e:
+            logger.info(f"No usable index stats file ({e})")
+        self._rescan_counts()
+
+    def _save_counts(self):
+        """Write the counters next to the shards (written aside, then renamed into place)."""
+        tmp_path = INDEX_STATS_FILE + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "fingerprint": INDEX_FINGERPRINT,
+                    "users": {str(user_id): n for user_id, n in self._user_counts.items()},
+                    "document_types": dict(self._type_counts),
+                    "categories": dict(self._category_counts),
+                }, f)
+            os.replace(tmp_path, INDEX_STATS_FILE)
+        except Exception as e:
+            logger.warning(f"Failed writing index stats: {e}")
+
+    def flush(self, force: bool = True):
+        """Save shards holding live adds; unless forced, only those due per the flush policy."""
+        now = time.time()
+        with self._save_lock:
+            for user_id, shard in list(self._shards.items()):
+                if not shard.dirty:
+                    continue
+                if not force and shard.pending < INDEX_FLUSH_PENDING and now - shard.dirty_since < INDEX_FLUSH_MAX_AGE:
+                    continue
+                try:
+                    self._save_shard(user_id, shard)
+                except Exception as e:
+                    logger.exception(f"Error flushing vector store for user_id={user_id}: {e}")
+
+    def _flush_loop(self):
+        while not self._stop_flush.wait(INDEX_FLUSH_INTERVAL):
+            self.flush(force=False)
+
+    def _log_adds(self, user_id: int, metadatas: List[Dict], vectors: List[List[float]]):
+        """Append live adds to the user's WAL so a crash before the next save loses nothing.
+
+        Callers hold _save_lock.
+        """
+        with open(_wal_path(user_id), "a") as f:
+            for metadata, vector in zip(metadatas, vectors):
+                f.write(json.dumps({
+                    "metadata": metadata,
+                    "vector": np.asarray(vector, dtype=np.float32).tolist(),
+                }) + "\n")
+
+    def _replay_wal(self, user_id: int, shard: _UserShard):
+        """Re-apply adds logged after the shard's last save (the process died before flushing)."""
+        metadatas, vectors = [], []
+        try:
+            with open(_wal_path(user_id), "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-append
+                        break
+                    metadatas.append(record["metadata"])
+                    vectors.append(record["vector"])
+        except OSError as e:
+            logger.warning(f"Could not read index WAL for user_id={user_id}: {e}")
+            return
+        if shard.store is not None:
+            # The shard may have been saved just before the log was removed
+            docstore = shard.store.docstore
+            keep = [i for i, metadata in enumerate(metadatas) if not docstore.has_transaction(int(metadata["id"]))]
+            metadatas = [metadatas[i] for i in keep]
+            vectors = [vectors[i] for i in keep]
+        if not metadatas:
+            return
+        texts = [_transaction_text(metadata) for metadata in metadatas]
+        shard.store = _append_embeddings(shard.store, texts, vectors, metadatas)
+        shard.mapped = False
+        shard.mark_dirty(len(metadatas))
+        logger.info(f"Replayed {len(metadatas)} logged adds into the index for user_id={user_id}")
+
+    def _add_live(self, user_id: int, texts: List[str], metadatas: List[Dict], vectors: List[List[float]]):
+        """Add new transactions to the user's shard and WAL; the flush thread saves the shard."""
+        with self._save_lock:
+            shard = self._shard(user_id)
+            if shard.store is not None:
+                # A rebuild_user_index that ran while this add sat in the index queue
+                # already picked the row up from MySQL; adding it again would duplicate it
+                docstore = shard.store.docstore
+                keep = [i for i, metadata in enumerate(metadatas) if not docstore.has_transaction(int(metadata["id"]))]
+                if len(keep) < len(metadatas):
+                    logger.info(f"Skipping {len(metadatas) - len(keep)} transactions already indexed for user_id={user_id}")
+                    texts = [texts[i] for i in keep]
+                    metadatas = [metadatas[i] for i in keep]
+                    vectors = [vectors[i] for i in keep]
+                if not metadatas:
+                    return
+            # A reindex reading MySQL may have missed these rows; it replays them before its swap
+            for pending in self._reindex_pending.get(user_id, ()):
+                pending.extend(zip(texts, metadatas, vectors))
+            self._add_embedded(user_id, texts, metadatas, vectors)
+            self._log_adds(user_id, metadatas, vectors)
+            shard.mark_dirty(len(texts))
+
+    def _end_reindex(self, user_id: int, pending: List) -> List:
+        """Stop collecting live adds for one reindex; returns what it collected. Callers hold _save_lock."""
+        runs = self._reindex_pending.get(user_id, [])
+        runs[:] = [run for run in runs if run is not pending]
+        if not runs:
+            self._reindex_pending.pop(user_id, None)
+        return pending
+
+    def close(self):
+        """Stop the flush thread and write out anything pending (registered with atexit)."""
+        self._stop_flush.set()
+        self._retrieval_pool.shutdown(wait=False)
+        self.flush()
+
     # -------------------------------
     # Conversation Memory Management
     # -------------------------------
-    def _get_or_create_memory(self, user_id: int) -> ConversationBufferWindowMemory:
+    def _get_or_create_memory(self, user_id: int) -> "ConversationBufferWindowMemory":
         """
         Get or create conversation memory for a user.
         Uses ConversationBufferWindowMemory to keep last N exchanges.
@@ -101,6 +941,7 @@ class BudgetWiseRAG:
             ConversationBufferWindowMemory instance
         """
         if user_id not in self.conversation_memories:
+            from langchain.memory import ConversationBufferWindowMemory
             logger.info(f"Creating new conversation memory for user {user_id}")
             # Keep last 5 exchanges (10 messages) for context without overwhelming the prompt
             self.conversation_memories[user_id] = ConversationBufferWindowMemory(
@@ -124,6 +965,8 @@ class BudgetWiseRAG:
         if user_id in self.conversation_memories:
             logger.info(f"Clearing conversation memory for user {user_id}")
             del self.conversation_memories[user_id]
+            with self._chains_lock:
+                self._chains.pop(user_id, None)
             return True
         return False
     
@@ -161,43 +1004,7 @@ class BudgetWiseRAG:
         """
         if not query:
             return False
-        q = str(query).lower()
-
-        # Core finance and app domain keywords/phrases
-        keywords = {
-            "expense", "expenses", "spend", "spent", "spending",
-            "income", "earn", "earned", "salary", "wage", "paycheck",
-            "budget", "savings", "save", "balance",
-            "transaction", "transactions", "category", "categories",
-            "rent", "food", "grocery", "groceries", "entertainment",
-            "subscription", "subscriptions", "utilities", "electricity",
-            "water", "gas", "fuel", "transport", "travel", "restaurant",
-            "coffee", "bill", "bills", "due",
-            "trend", "average", "total", "sum", "breakdown", "insight", "insights",
-            "forecast", "recommendation", "recommendations",
-            # time words and months to catch queries like "food in August"
-            "daily", "weekly", "monthly", "yearly", "quarter",
-            "january", "february", "march", "april", "may", "june",
-            "july", "august", "september", "october", "november", "december",
-        }
-
-        if any(k in q for k in keywords):
-            return True
-
-        # Money patterns
-        money_markers = ["$", "usd", "dollar", "dollars"]
-        if any(m in q for m in money_markers):
-            return True
-
-        # Common question forms tied to quantities/totals
-        phrases = [
-            "how much", "how many", "what is my", "show me", "compare",
-            "list my", "sum of", "total of", "spending on", "income from",
-        ]
-        if any(p in q for p in phrases):
-            return True
-
-        return False
+        return _query_in_scope(str(query))
         
     @staticmethod
     def create_faiss_vectorstore(documents, index_name=VECTOR_STORE_DIR):
@@ -206,89 +1013,156 @@ class BudgetWiseRAG:
             logger.warning("No documents provided to create vector store")
             return None
             
-        vectorstore = FAISS.from_documents(documents, embeddings)
+        vectorstore = _vector_store_from_documents(documents)
         vectorstore.save_local(index_name)
         # Persist embedding model fingerprint
         try:
             Path(index_name).mkdir(parents=True, exist_ok=True)
             with open(os.path.join(index_name, "embedding_model.txt"), "w") as f:
-                f.write(EMBEDDING_MODEL)
+                f.write(INDEX_FINGERPRINT)
         except Exception as e:
             logger.warning(f"Failed writing embedding fingerprint: {e}")
         return vectorstore
         
-    def _load_vector_store(self):
-        """Load the vector store if it exists."""
+    def _check_fingerprint(self):
+        """Clear shards written by another embedding model / index format. Callers hold _save_lock."""
+        self._fingerprint_checked = True
+        saved = [
+            os.path.join(VECTOR_STORE_DIR, fname) for fname in os.listdir(VECTOR_STORE_DIR)
+            if fname.endswith((".faiss", ".pkl", ".wal.jsonl"))
+        ]
+        if not saved:
+            return
+        # Check embedding model compatibility
+        try:
+            with open(EMBEDDING_ID_FILE, "r") as f:
+                stored_model = f.read().strip()
+        except Exception:
+            stored_model = None
+
+        if stored_model != INDEX_FINGERPRINT:
+            logger.warning(
+                f"Embedding model / index format mismatch or missing: stored='{stored_model}' current='{INDEX_FINGERPRINT}'. "
+                "Clearing old index to avoid incompatibility."
+            )
+            # Remove old index files (including the pre-shard index.faiss / index.pkl)
+            try:
+                for fpath in saved:
+                    os.remove(fpath)
+                if os.path.exists(EMBEDDING_ID_FILE):
+                    os.remove(EMBEDDING_ID_FILE)
+            except Exception as e:
+                logger.warning(f"Failed to remove old index files: {e}")
+
+    def _load_shard(self, user_id: int) -> _UserShard:
+        """Load the user's saved shard if it exists, plus any adds logged since it was saved."""
+        has_wal = os.path.exists(_wal_path(user_id))
+        shard = self._read_shard(user_id, mmap=not has_wal)
+        if has_wal:
+            self._replay_wal(user_id, shard)
+        return shard
+
+    def _read_shard(self, user_id: int, mmap: bool = True) -> _UserShard:
+        index_path, docstore_path = _shard_paths(user_id)
+        if not os.path.exists(index_path):
+            return _UserShard(None)
         try:
-            if os.path.exists(os.path.join(VECTOR_STORE_DIR, "index.faiss")):
-                # Check embedding model compatibility
+            # Same pieces FAISS.load_local reads, but the vectors are mapped from disk
+            # instead of copied into RAM, so loading doesn't grow with the user's history.
+            # A shard about to replay its WAL is read fully, since it is written to at once.
+            mapped = False
+            if mmap:
                 try:
-                    with open(EMBEDDING_ID_FILE, "r") as f:
-                        stored_model = f.read().strip()
-                except Exception:
-                    stored_model = None
-
-                if (stored_model is None) or (stored_model != EMBEDDING_MODEL):
-                    logger.warning(
-                        f"Embedding model mismatch or missing: stored='{stored_model}' current='{EMBEDDING_MODEL}'. "
-                        "Clearing old index to avoid incompatibility."
-                    )
-                    # Remove old index files
-                    try:
-                        for fname in ("index.faiss", "index.pkl"):
-                            fpath = os.path.join(VECTOR_STORE_DIR, fname)
-                            if os.path.exists(fpath):
-                                os.remove(fpath)
-                        if os.path.exists(EMBEDDING_ID_FILE):
-                            os.remove(EMBEDDING_ID_FILE)
-                    except Exception as e:
-                        logger.warning(f"Failed to remove old index files: {e}")
-                    self.vector_store = None
-                    return
-                logger.info("Loading existing FAISS index")
-                self.vector_store = FAISS.load_local(
-                    VECTOR_STORE_DIR,
-                    embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info(f"Loaded index with {len(self.vector_store.docstore._dict)} documents")
-            else:
-                logger.info("No existing FAISS index found")
-                self.vector_store = None
+                    index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                    mapped = True
+                except RuntimeError as e:
+                    logger.info(f"FAISS index cannot be memory-mapped, reading it fully: {e}")
+            if not mapped:
+                index = faiss.read_index(index_path)
+            with open(docstore_path, "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            store = _configure_search(FAISS(
+                embedding_function=get_embedder(),
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            ))
+            logger.info(f"Loaded index for user_id={user_id} with {len(docstore)} documents")
+            return _UserShard(store, mapped)
         except Exception as e:
-            logger.error(f"Error loading vector store: {e}")
-            self.vector_store = None
+            logger.error(f"Error loading vector store for user_id={user_id}: {e}")
+            return _UserShard(None)
 
     def _format_transaction(self, transaction: Dict) -> str:
         """Format a transaction into a standardized string representation."""
-        tx_date = transaction.get("date", "unknown_date")
-        tx_type = transaction.get("type", "unknown_type") 
-        tx_category = transaction.get("category", "uncategorized")
-        tx_amount = transaction.get("amount", 0)
-        tx_note = transaction.get("note", "")
-        
-        return (
-            f"Transaction ID: {transaction.get('id')} | "
-            f"User: {transaction.get('user_id')} | "
-            f"Date: {tx_date} | "
-            f"Type: {tx_type} | "
-            f"Category: {tx_category} | "
-            f"Amount: ₹{float(tx_amount):.2f} | "
-            f"Note: {tx_note}"
-        )
+        return _transaction_text(transaction)
 
     def _create_metadata(self, transaction: Dict) -> Dict:
-        """Create metadata for a transaction document."""
+        """Create metadata for a transaction document.
+
+        Values keep their API types (int ids, float amount, ISO date string) so retrieval
+        can hand the metadata back as-is instead of parsing it on every query.
+        """
+        get = transaction.get
         return {
-            "id": str(transaction.get("id")),
-            "user_id": str(transaction.get("user_id")),
-            "date": str(transaction.get("date")),
-            "type": transaction.get("type", ""),
-            "category": transaction.get("category", ""),
-            "amount": str(float(transaction.get("amount", 0))),
-            "note": transaction.get("note", ""),
+            "id": int(get("id")),
+            "user_id": int(get("user_id")),
+            "date": str(get("date")),
+            "type": get("type", ""),
+            "category": get("category", ""),
+            "amount": float(get("amount", 0)),
+            "note": get("note", ""),
         }
     
+    def _add_embedded(self, user_id: int, texts: List[str], metadatas: List[Dict], vectors: List[List[float]]):
+        """Add embedded texts to the user's shard, creating its store on the first batch."""
+        with self._save_lock:
+            shard = self._shard(user_id)
+            self._ensure_writable(user_id, shard)
+            if shard.store is None:
+                logger.info(f"Creating new FAISS index for user_id={user_id} from batch embeddings")
+            else:
+                logger.info(f"Adding {len(vectors)} embeddings to FAISS index for user_id={user_id}")
+            store = _append_embeddings(shard.store, texts, vectors, metadatas)
+            if store is not shard.store:
+                self._set_store(user_id, shard, store)
+            self._count_metadatas(user_id, metadatas)
+
+    def _embed_and_add(self, texts: List[str], metadatas: List[Dict], add):
+        """Embed one batch and pass it to add(texts, metadatas, vectors), retrying in smaller
+        batches if the first attempt fails."""
+        # Create or update the vector store with EFFICIENT BATCH embedding
+        try:
+            logger.info(f"Preparing batch embedding for {len(texts)} documents")
+            vectors = embed_sorted(texts)
+            logger.info(f"Successfully created {len(vectors)} embeddings")
+            add(texts, metadatas, vectors)
+            return
+        except Exception as e:
+            logger.exception(f"Error in batch embedding: {e}")
+        
+        # If failed and looks like rate limit, retry with more aggressive batching
+        logger.warning("First batch attempt failed, will retry with smaller batches")
+        try:
+            batch_size = 10  # reduced size for retry
+            # Process in smaller batches with delays
+            for i in range(0, len(texts), batch_size):
+                batch_texts = texts[i:i+batch_size]
+                batch_metadatas = metadatas[i:i+batch_size]
+                
+                logger.info(f"Retry batch {i//batch_size + 1}: Processing {len(batch_texts)} documents")
+                vectors = embed_sorted(batch_texts)
+                add(batch_texts, batch_metadatas, vectors)
+                
+                # Wait between batches
+                if i + batch_size < len(texts):
+                    logger.info("Waiting between batches to avoid rate limits...")
+                    time.sleep(0.5)
+        except Exception as e:
+            logger.exception(f"Batch retry failed: {e}")
+            raise
+
     def index_user_transactions(self, user_id: int, reindex: bool = False) -> int:
         """
         Index or reindex a user's transactions.
@@ -301,144 +1175,109 @@ class BudgetWiseRAG:
             Number of transactions indexed
         """
         logger.info(f"Indexing transactions for user {user_id}, reindex={reindex}")
+        user_id = int(user_id)
         
-        # Connect to the database and get transactions
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT id, user_id, date, category, note, amount, type FROM expenses WHERE user_id=%s",
-            (user_id,)
-        )
-        transactions = cursor.fetchall()
-        conn.close()
+        format_transaction = self._format_transaction
+        create_metadata = self._create_metadata
+        indexed = 0
         
-        if not transactions:
-            logger.info(f"No transactions found for user {user_id}")
-            return 0
+        # A reindex builds a new shard off to the side and swaps it in at the end, so
+        # searches keep using the old one meanwhile; other users' shards are untouched
+        rebuilt = None
         
-        # Process transactions into documents
-        documents = []
-        for tx in transactions:
-            # Create the document text from the transaction
-            content = self._format_transaction(tx)
-            # Create metadata for filtering and reconstruction
-            metadata = self._create_metadata(tx)
-            # Create the document
-            doc = Document(page_content=content, metadata=metadata)
-            documents.append(doc)
-            
-        logger.info(f"Created {len(documents)} documents for indexing (user_id={user_id})")
+        def add_to_rebuilt(texts, metadatas, vectors):
+            nonlocal rebuilt
+            rebuilt = _append_embeddings(rebuilt, texts, vectors, metadatas)
         
-        # Handle reindexing
-        if reindex and self.vector_store is not None:
-            # Since we can't easily delete by user_id, rebuild without those documents
-            try:
-                current_docs = getattr(self.vector_store.docstore, "_dict", {})
-                filtered_docs = [
-                    doc for _, doc in current_docs.items()
-                    if doc.metadata.get("user_id") != str(user_id)
-                ]
-                if filtered_docs:
-                    # Rebuild with only non-user documents
-                    self.vector_store = FAISS.from_documents(filtered_docs, embeddings)
-                else:
-                    # No documents from other users, start fresh
-                    self.vector_store = None
-            except Exception as e:
-                logger.error(f"Error during reindex filtering for user_id={user_id}: {e}")
-                self.vector_store = None
+        def add_to_shard(texts, metadatas, vectors):
+            self._add_embedded(user_id, texts, metadatas, vectors)
         
-        # Create or update the vector store with EFFICIENT BATCH embedding
-        def _batch_create_or_update():
-            # Prepare text and metadatas for batch embedding
-            texts = []
-            metadatas = []
-            for doc in documents:
-                texts.append(doc.page_content)
-                metadatas.append(doc.metadata)
-            
-            logger.info(f"Preparing batch embedding for {len(texts)} documents")
-            
-            # Batch embed all documents in one API call
-            try:
-                logger.info("Calling embedding API in batch mode")
-                vectors = embeddings.embed_documents(texts)
-                logger.info(f"Successfully created {len(vectors)} embeddings")
-                
-                # If no existing store, create new one with all embeddings
-                if self.vector_store is None:
-                    logger.info("Creating new FAISS index from batch embeddings")
-                    self.vector_store = FAISS.from_embeddings(
-                        text_embeddings=list(zip(texts, vectors)),
-                        embedding=embeddings,
-                        metadatas=metadatas
-                    )
-                else:
-                    # Add batch to existing store
-                    logger.info(f"Adding {len(vectors)} embeddings to existing FAISS index")
-                    self.vector_store.add_embeddings(
-                        text_embeddings=list(zip(texts, vectors)),
-                        metadatas=metadatas
-                    )
-                return True
-            except Exception as e:
-                logger.exception(f"Error in batch embedding: {e}")
-                return False
+        add = add_to_rebuilt if reindex else add_to_shard
         
-        # First attempt
-        success = _batch_create_or_update()
+        if reindex:
+            # Registered before the SELECT: adds run after their row commits, so any add from
+            # here on may be missing from the snapshot, and an earlier one is in it
+            pending = []
+            with self._save_lock:
+                self._reindex_pending.setdefault(user_id, []).append(pending)
         
-        # If failed and looks like rate limit, retry with more aggressive batching
-        if not success:
-            logger.warning("First batch attempt failed, will retry with smaller batches")
+        conn = get_db_connection()
+        try:
+            # Unbuffered cursor: rows are pulled INDEX_FETCH_SIZE at a time and each chunk is
+            # embedded before the next is read, so memory stays O(chunk) instead of O(rows)
+            cursor = conn.cursor(buffered=False)
+            cursor.execute(
+                "SELECT id, user_id, date, category, note, amount, type FROM expenses WHERE user_id=%s",
+                (user_id,)
+            )
+            rows = cursor.fetchmany(INDEX_FETCH_SIZE)
+            if not rows and not reindex:
+                logger.info(f"No transactions found for user {user_id}")
+                return 0
+            
+            while rows:
+                # Build embedding texts and metadata in one pass; Document objects would only
+                # be taken apart again before embedding
+                texts = []
+                metadatas = []
+                for row in rows:
+                    # Plain tuple cursor + one zip per row is cheaper than the dictionary cursor's per-row conversion
+                    tx = dict(zip(TRANSACTION_COLS, row))
+                    texts.append(format_transaction(tx))
+                    metadatas.append(create_metadata(tx))
+                self._embed_and_add(texts, metadatas, add)
+                indexed += len(texts)
+                logger.info(f"Indexed {indexed} transactions so far (user_id={user_id})")
+                rows = cursor.fetchmany(INDEX_FETCH_SIZE)
+        except BaseException:
+            if reindex:
+                with self._save_lock:
+                    self._end_reindex(user_id, pending)
+            raise
+        finally:
+            # An exception mid-stream leaves rows unread, which would fail the first statement
+            # of the connection's next checkout
             try:
-                # Split into smaller batches
-                batch_size = 10  # reduced size for retry
-                all_texts = []
-                all_metadatas = []
-                
-                for doc in documents:
-                    all_texts.append(doc.page_content)
-                    all_metadatas.append(doc.metadata)
-                
-                # Process in smaller batches with delays
-                for i in range(0, len(all_texts), batch_size):
-                    batch_texts = all_texts[i:i+batch_size]
-                    batch_metadatas = all_metadatas[i:i+batch_size]
-                    
-                    logger.info(f"Retry batch {i//batch_size + 1}: Processing {len(batch_texts)} documents")
-                    vectors = embeddings.embed_documents(batch_texts)
-                    
-                    if self.vector_store is None:
-                        self.vector_store = FAISS.from_embeddings(
-                            text_embeddings=list(zip(batch_texts, vectors)),
-                            embedding=embeddings,
-                            metadatas=batch_metadatas
-                        )
-                    else:
-                        self.vector_store.add_embeddings(
-                            text_embeddings=list(zip(batch_texts, vectors)),
-                            metadatas=batch_metadatas
-                        )
-                    
-                    # Wait between batches
-                    if i + batch_size < len(all_texts):
-                        logger.info("Waiting between batches to avoid rate limits...")
-                        time.sleep(0.5)
-            except Exception as e:
-                logger.exception(f"Batch retry failed: {e}")
-                raise
+                conn.consume_results()
+            except Exception:
+                pass
+            conn.close()
             
-        # Save the updated vector store
-        self.vector_store.save_local(VECTOR_STORE_DIR)
-        # Persist embedding model fingerprint
-        try:
-            with open(EMBEDDING_ID_FILE, "w") as f:
-                f.write(EMBEDDING_MODEL)
-        except Exception as e:
-            logger.warning(f"Failed writing embedding fingerprint: {e}")
-        logger.info(f"Saved index with {len(self.vector_store.docstore._dict)} total documents")
-        return len(documents)
+        with self._save_lock:
+            shard = self._shard(user_id)
+            if reindex:
+                # Live adds since the SELECT went to the old shard only; without this replay
+                # the swap would drop them. Rows the snapshot already returned are skipped.
+                missed = [
+                    item for item in self._end_reindex(user_id, pending)
+                    if rebuilt is None or not rebuilt.docstore.has_transaction(int(item[1]["id"]))
+                ]
+                if missed:
+                    logger.info(f"Replaying {len(missed)} adds made during the reindex of user_id={user_id}")
+                    texts, metadatas, vectors = (list(column) for column in zip(*missed))
+                    rebuilt = _append_embeddings(rebuilt, texts, vectors, metadatas)
+                # None when the user has no transactions left: the shard files are removed
+                self._count_store(user_id, shard.store, -1)
+                self._set_store(user_id, shard, rebuilt)
+                self._count_store(user_id, rebuilt)
+            if shard.store is not None:
+                promoted = _promote_to_ivf(shard.store.index)
+                if promoted is not None:
+                    logger.info(f"Rebuilt FAISS index for user_id={user_id} as {IVF_PQ_FACTORY} ({promoted.ntotal} vectors)")
+                    shard.store.index = promoted
+                    shard.mapped = False
+                    _configure_search(shard.store)
+            
+            # Bulk builds are saved right away
+            self._save_shard(user_id, shard)
+            logger.info(f"Saved index for user_id={user_id} with {len(shard.store.docstore) if shard.store is not None else 0} documents")
+        # Cached answers were computed from the previous data
+        self._answer_cache.invalidate(user_id)
+        return indexed
+
+    def rebuild_user_index(self, user_id: int) -> int:
+        """Re-embed one user's transactions after an edit or delete (only their shard is rebuilt)."""
+        return self.index_user_transactions(user_id, reindex=True)
     
     def add_transaction_to_index(self, transaction: Dict) -> bool:
         """
@@ -451,48 +1290,92 @@ class BudgetWiseRAG:
             True if successful, False otherwise
         """
         try:
+            user_id = int(transaction.get("user_id"))
+            
             # Format the transaction text 
-            text = f"Transaction ID: {transaction.get('id')} | User: {transaction.get('user_id')} | "
-            text += f"Date: {transaction.get('date', 'unknown_date')} | Type: {transaction.get('type', 'unknown_type')} | "
-            text += f"Category: {transaction.get('category', 'uncategorized')} | "
-            text += f"Amount: ₹{float(transaction.get('amount', 0)):.2f} | Note: {transaction.get('note', '')}"
+            text = self._format_transaction(transaction)
             
             # Create metadata
             metadata = self._create_metadata(transaction)
             
             # Get embedding in a single API call (even though it's just one doc)
-            vector = embeddings.embed_documents([text])[0]
+            vector = get_embedder().embed_documents([text])[0]
             
-            # Add to the vector store
-            if self.vector_store is None:
-                logger.info("Creating new FAISS index for first transaction")
-                self.vector_store = FAISS.from_embeddings(
-                    text_embeddings=[(text, vector)],
-                    embedding=embeddings,
-                    metadatas=[metadata]
-                )
-            else:
-                logger.info(f"Adding transaction {transaction.get('id')} to existing FAISS index")
-                self.vector_store.add_embeddings(
-                    text_embeddings=[(text, vector)],
-                    metadatas=[metadata]
-                )
-                
-            # Save the updated vector store
-            self.vector_store.save_local(VECTOR_STORE_DIR)
-            # Persist embedding model fingerprint
-            try:
-                with open(EMBEDDING_ID_FILE, "w") as f:
-                    f.write(EMBEDDING_MODEL)
-            except Exception as e:
-                logger.warning(f"Failed writing embedding fingerprint: {e}")
-            logger.info(f"Added transaction {transaction.get('id')} to index for user_id={transaction.get('user_id')}")
+            # Add to the user's shard and WAL; the shard files are rewritten by the flush thread
+            self._add_live(user_id, [text], [metadata], [vector])
+            logger.info(f"Added transaction {transaction.get('id')} to index for user_id={user_id}")
+            self._answer_cache.invalidate(user_id)
             return True
         except Exception as e:
             logger.exception(f"Error adding transaction to index: {e}")
             return False
+
+    def add_transactions_to_index(self, transactions: List[Dict]) -> bool:
+        """
+        Add a batch of one user's new transactions (bulk import) to the index.
+        
+        Embeds the batch in one encoder call and appends it to the shard in one step;
+        like single adds, it is logged to the WAL and the shard is saved by the flush thread.
+        
+        Args:
+            transactions: Transaction rows, all with the same user_id
             
-    def get_relevant_transactions(self, user_id: int, query: str, top_k: int = 10) -> List[Dict]:
+        Returns:
+            True if successful, False otherwise
+        """
+        if not transactions:
+            return True
+        try:
+            user_id = int(transactions[0].get("user_id"))
+            texts = [self._format_transaction(tx) for tx in transactions]
+            metadatas = [self._create_metadata(tx) for tx in transactions]
+            vectors = embed_sorted(texts)
+            self._add_live(user_id, texts, metadatas, vectors)
+            logger.info(f"Added {len(transactions)} transactions to index for user_id={user_id}")
+            self._answer_cache.invalidate(user_id)
+            return True
+        except Exception as e:
+            logger.exception(f"Error adding transactions to index: {e}")
+            return False
+
+    def _search_index(self, user_id: int, vector_store: FAISS):
+        """Index to run searches on: the GPU copy when one is available, else the CPU index."""
+        if not self._gpu_enabled:
+            return vector_store.index
+        key = (id(vector_store.index), vector_store.index.ntotal)
+        with self._gpu_lock:
+            cached = self._gpu_indexes.get(user_id)
+            if cached is None or cached[0] != key:
+                try:
+                    gpu_index = _to_gpu(vector_store.index)
+                except Exception as e:
+                    logger.warning(f"GPU index copy failed, searching on CPU: {e}")
+                    self._gpu_enabled = False
+                    gpu_index = None
+                cached = self._gpu_indexes[user_id] = (key, gpu_index)
+            return cached[1] if cached[1] is not None else vector_store.index
+
+    def _turn_query_vector(self, user_id: int, query: str) -> Optional[np.ndarray]:
+        """The current request's query embedding if it was computed for this exact question."""
+        turn = getattr(self._turn, "current", None)
+        if turn is not None and turn[0] == user_id and turn[1] == query:
+            return turn[2]
+        return None
+
+    def _embed_user_query(self, user_id: int, query: str) -> np.ndarray:
+        # Add user_id to query for better retrieval
+        text = f"user:{user_id} {query}"
+        with self._embed_cache_lock:
+            vector = self._embed_cache.get(text)
+        if vector is None:
+            # Shared between requests: callers must not normalize / scale it in place
+            vector = self._query_batcher.embed(text)
+            with self._embed_cache_lock:
+                self._embed_cache[text] = vector
+        return vector
+
+    def get_relevant_transactions(self, user_id: int, query: str, top_k: int = 10,
+                                  query_vector: Optional[np.ndarray] = None) -> List[Dict]:
         """
         Retrieve relevant transactions for a user query.
         
@@ -500,68 +1383,68 @@ class BudgetWiseRAG:
             user_id: The user ID to retrieve transactions for
             query: The natural language query
             top_k: Maximum number of results to return
+            query_vector: The query's embedding if the caller already computed it
             
         Returns:
             List of relevant transaction dictionaries with scores
         """
-        if self.vector_store is None:
-            logger.warning("No vector store available for retrieval")
+        user_id = int(user_id)
+        vector_store = self._user_store(user_id)
+        if vector_store is None:
+            logger.info(f"No indexed transactions for user_id={user_id}")
             return []
             
-        # Add user_id to query for better retrieval
-        user_context_query = f"user:{user_id} {query}"
+        if query_vector is None:
+            query_vector = self._embed_user_query(user_id, query)
+
+        # The shard holds only this user's transactions, so nothing needs filtering out
+        k = min(top_k, int(vector_store.index.ntotal))
+        index = self._search_index(user_id, vector_store)
+        try:
+            scores, rows = index.search(query_vector.reshape(1, -1), k)
+        except RuntimeError as e:
+            if index is vector_store.index:
+                raise
+            logger.warning(f"GPU search failed, searching on CPU: {e}")
+            self._gpu_enabled = False
+            scores, rows = vector_store.index.search(query_vector.reshape(1, -1), k)
         
-        # Search the vector store
-        results = self.vector_store.similarity_search_with_score(
-            user_context_query,
-            k=top_k*2  # Get more results than needed to filter by user
-        )
+        # Results arrive best first; -1 rows pad out fewer matches than requested
+        found = rows[0] >= 0
+        # The id mapping is updated after the index during adds, so a fresh row may lack one
+        row_to_id = vector_store.index_to_docstore_id
+        docstore = vector_store.docstore
+        hits = [
+            (doc_id, score)
+            for doc_id, score in zip(map(row_to_id.get, rows[0][found].tolist()), scores[0][found].tolist())
+            if doc_id is not None and doc_id in docstore
+        ]
+        # Gathered column by column from the docstore (page_content isn't rendered), then
+        # zipped into the per-match dicts the chain's Documents and the JSON response need
+        columns = docstore.columns([doc_id for doc_id, _ in hits])
+        columns["score"] = [score for _, score in hits]  # cosine similarity of normalized vectors
+        keys = tuple(columns)
         
-        # Filter to user_id and format results
         filtered_results = []
-        seen_ids = set()  # Track seen transaction IDs to avoid duplicates
-        
-        for doc, score in results:
-            doc_user_id = doc.metadata.get("user_id")
-            if doc_user_id != str(user_id):
-                continue
-                
-            tx_id = doc.metadata.get("id")
-            if tx_id in seen_ids:
+        seen_ids = set()  # A transaction indexed twice (build + live add) is returned once
+        for values in zip(*columns.values()):
+            if values[0] in seen_ids:
                 continue
-                
-            seen_ids.add(tx_id)
-            
-            # Convert score to similarity (FAISS returns distance, smaller is more similar)
-            similarity = float(score)
-            
-            # Create a transaction dictionary from metadata
-            transaction = {
-                "id": int(doc.metadata.get("id")),
-                "user_id": int(doc.metadata.get("user_id")),
-                "date": doc.metadata.get("date"),
-                "type": doc.metadata.get("type"),
-                "category": doc.metadata.get("category"),
-                "amount": float(doc.metadata.get("amount")),
-                "note": doc.metadata.get("note"),
-                "score": similarity
-            }
-            
-            filtered_results.append(transaction)
-            
-            # Stop when we have enough results
-            if len(filtered_results) >= top_k:
-                break
+            seen_ids.add(values[0])
+            filtered_results.append(dict(zip(keys, values)))
                 
         logger.info(f"Retrieved {len(filtered_results)} matches for user_id={user_id} query='{query[:60]}'")
         return filtered_results
     
-    def _setup_rag_pipeline(self):
+    def _setup_rag_pipeline(self, user_id: int):
         """
         Set up the RAG pipeline using RetrievalQA chain.
         Similar to the reference rag_pipeline.py.
         """
-        if not self.vector_store:
+        from langchain.chains import RetrievalQA
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        vector_store = self._user_store(user_id)
+        if not vector_store:
             logger.warning("Cannot set up RAG pipeline without vector store")
             return None
 
@@ -631,11 +1514,49 @@ class BudgetWiseRAG:
         return RetrievalQA.from_chain_type(
             llm=llm,
             chain_type="stuff",
-            retriever=self.vector_store.as_retriever(search_kwargs={"k": 8}),  # Increased to 8 for better context
+            retriever=vector_store.as_retriever(search_kwargs={"k": 8}),  # Increased to 8 for better context
             return_source_documents=True,
             chain_type_kwargs={"prompt": prompt}
         )
         
+    def _get_chat_llm(self) -> "ChatGoogleGenerativeAI":
+        """The shared chat model; the client is thread-safe and holds no per-user state."""
+        if self._chat_llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            self._chat_llm = ChatGoogleGenerativeAI(
+                model=GEMINI_MODEL,
+                google_api_key=GEMINI_API_KEY,
+                temperature=0.7  # Higher temperature for more natural, human-like responses
+            )
+        return self._chat_llm
+
+    def _get_conversation_chain(self, user_id: int, memory) -> "ConversationalRetrievalChain":
+        """Reuse the user's chain while its memory object is unchanged.
+
+        The retriever looks the user's shard up on every call, so adds and rebuilds are
+        picked up as they happen; a cleared memory yields a new object, which rebuilds the chain.
+        """
+        with self._chains_lock:
+            cached = self._chains.get(user_id)
+            if cached is not None and cached[0] is memory:
+                return cached[1]
+        from langchain.chains import ConversationalRetrievalChain
+        # User-restricted search; k increased for richer context
+        filtered_retriever = UserTransactionRetriever(rag=self, user_id=int(user_id), k=12)
+        # Create conversational retrieval chain
+        qa_chain = ConversationalRetrievalChain.from_llm(
+            llm=self._get_chat_llm(),
+            retriever=filtered_retriever,
+            memory=memory,
+            condense_question_prompt=CONDENSE_QUESTION_PROMPT,
+            combine_docs_chain_kwargs={"prompt": CONVERSATION_QA_PROMPT},
+            return_source_documents=False,
+            verbose=False
+        )
+        with self._chains_lock:
+            self._chains[user_id] = (memory, qa_chain)
+        return qa_chain
+
     def generate_answer(self, user_id: int, query: str, matches: List[Dict]) -> str:
         """
         Generate an answer using retrieved matches, conversation memory, and the Gemini model.
@@ -643,7 +1564,8 @@ class BudgetWiseRAG:
         Args:
             user_id: User ID for context
             query: The original user query
-            matches: List of retrieved transaction dictionaries
+            matches: List of retrieved transaction dictionaries, or a Future resolving to
+                one (query_with_rag runs the search alongside the chain's LLM call)
             
         Returns:
             Generated answer text
@@ -652,96 +1574,19 @@ class BudgetWiseRAG:
         if not self._is_query_relevant(query):
             return OOC_MESSAGE
 
-        if not matches:
-            return "I couldn't find any relevant transactions to answer your question. Try rephrasing or ask about different transactions."
+        # A pending search is only waited for on the fallback path; the chain retrieves itself
+        pending = matches if isinstance(matches, Future) else None
+        if pending is None and not matches:
+            return NO_MATCHES_MESSAGE
         
         # Get conversation memory for this user
         memory = self._get_or_create_memory(user_id)
         
-        # Format the transactions for the context
-        formatted_transactions = []
-        for tx in matches:
-            tx_str = (
-                f"Transaction ID: {tx.get('id')} | "
-                f"User: {tx.get('user_id')} | "
-                f"Date: {tx.get('date')} | "
-                f"Type: {tx.get('type')} | "
-                f"Category: {tx.get('category')} | "
-                f"Amount: ₹{float(tx.get('amount')):.2f} | "
-                f"Note: {tx.get('note')}"
-            )
-            formatted_transactions.append(tx_str)
-            
-        context = "\n".join(formatted_transactions)
-        
         # Use ConversationalRetrievalChain if vector store is available
         try:
-            if self.vector_store is not None:
-                # Using metadata filter for user-specific context
-                filtered_retriever = self.vector_store.as_retriever(
-                    search_kwargs={"k": 12, "filter": {"user_id": str(user_id)}}  # Increased for richer context
-                )
-                
-                # Create an LLM for conversational query
-                llm = ChatGoogleGenerativeAI(
-                    model=GEMINI_MODEL,
-                    google_api_key=GEMINI_API_KEY,
-                    temperature=0.7  # Higher temperature for more natural, human-like responses
-                )
-                
-                # Conversational prompt with memory context
-                condense_question_prompt = PromptTemplate(
-                    template="""Based on our conversation so far and this new question, what is the user really asking about?
-
-Previous conversation:
-{chat_history}
-
-New question: {question}
-
-Rephrased as a clear, standalone question:""",
-                    input_variables=["chat_history", "question"]
-                )
-                
-                # Main QA prompt with conversation awareness
-                qa_prompt_template = """
-You're a friendly, casual financial buddy helping someone understand their money habits. You remember what you've talked about before.
-
-CRITICAL RULES:
-1. If they ask about anything OTHER than money, spending, income, budgets, or savings → respond with ONLY: """ + OOC_MESSAGE + """
-2. Otherwise, help them understand their finances in a natural, friendly way.
-
-HOW TO RESPOND:
-- Talk like a real person, not a robot
-- Reference earlier parts of the conversation naturally (e.g., "Like I mentioned...", "Remember when we talked about...", "Compared to that...")
-- Get straight to the point - no "Based on the data" or "According to the transactions"
-- Use actual numbers and be specific
-- Highlight important amounts in **bold**
-- Share insights if you notice patterns
-- Keep it friendly and conversational - 2-3 short paragraphs max
-- If they ask follow-ups like "what about X?" or "how much on Y?", understand they're continuing the conversation
-
-Here are their relevant transactions:
-{context}
-
-Their question: {question}
-
-Your response:"""
-                
-                qa_prompt = PromptTemplate(
-                    template=qa_prompt_template,
-                    input_variables=["context", "question"]
-                )
-                
-                # Create conversational retrieval chain
-                qa_chain = ConversationalRetrievalChain.from_llm(
-                    llm=llm,
-                    retriever=filtered_retriever,
-                    memory=memory,
-                    condense_question_prompt=condense_question_prompt,
-                    combine_docs_chain_kwargs={"prompt": qa_prompt},
-                    return_source_documents=False,
-                    verbose=False
-                )
+            if self._user_store(user_id) is not None:
+                # LLM, prompts and chain are built once per user and memory, not per question
+                qa_chain = self._get_conversation_chain(user_id, memory)
                 
                 # Run the chain with memory
                 result = qa_chain({"question": query})
@@ -751,31 +1596,26 @@ Your response:"""
                 return answer
             else:
                 # Fallback to direct LLM with manual memory if no vector store
-                llm = ChatGoogleGenerativeAI(
-                    model=GEMINI_MODEL,
-                    google_api_key=GEMINI_API_KEY,
-                    temperature=0.7  # Higher temperature for more natural, human-like responses
-                )
+                if pending is not None:
+                    matches = pending.result()
+                    if not matches:
+                        return NO_MATCHES_MESSAGE
+                
+                # Format the transactions for the context: one format_map per match, joined once
+                context = "\n".join(map(FALLBACK_CONTEXT_LINE.format_map, matches))
+                
+                llm = self._get_chat_llm()
                 
                 # Get conversation history
                 history_messages = memory.chat_memory.messages if memory else []
                 
-                messages = [
-                    SystemMessage(content=(
-                        "You're a friendly financial buddy who remembers conversations. "
-                        "Talk naturally - no robotic phrases like 'Based on the data' or 'According to'. "
-                        "Just answer directly like a helpful friend would. Use specific numbers and dates. "
-                        "Reference what you talked about before when relevant. "
-                        "Bold important amounts. Keep it casual and conversational. "
-                        "If they ask about non-financial stuff, only say: " + OOC_MESSAGE
-                    ))
-                ]
+                messages = [FALLBACK_SYSTEM_MESSAGE]
                 
                 # Add conversation history
                 messages.extend(history_messages)
                 
                 # Add current query with context
-                messages.append(HumanMessage(content=f"My question is: {query}\n\nHere are my relevant transactions:\n{context}"))
+                messages.append(HumanMessage(content=FALLBACK_QUESTION_TEMPLATE.format(query=query, context=context)))
                 
                 response = llm.invoke(messages)
                 answer = response.content
@@ -787,7 +1627,7 @@ Your response:"""
                 
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
-            return f"I had trouble analyzing your transactions. Please try again. Technical details: {str(e)[:100]}"
+            return f"{ANSWER_ERROR_PREFIX} Please try again. Technical details: {str(e)[:100]}"
             
     def query_with_rag(self, user_id: int, query: str, top_k: int = 10) -> Dict:
         """
@@ -808,29 +1648,57 @@ Your response:"""
                 return {"answer": OOC_MESSAGE, "matches": []}
 
             # Check if index exists for this user
-            if self.vector_store is None:
+            if self._user_store(user_id) is None:
                 return {
                     "answer": "Your financial data hasn't been indexed yet. Please build the index first.",
                     "matches": []
                 }
                 
-            # Retrieve relevant transactions
-            matches = self.get_relevant_transactions(user_id, query, top_k)
+            # Only a conversation's first question is answered from / stored in the cache;
+            # follow-ups depend on the history, not just on their own wording
+            memory = self.conversation_memories.get(user_id)
+            first_turn = memory is None or not memory.chat_memory.messages
+            cached = self._answer_cache.get_exact(user_id, query, top_k) if first_turn else None
+            if cached is None:
+                # One encoder pass per turn: the cache lookup, retrieval and the chain's retriever
+                # (whose first-turn question is this query unchanged) all use this vector
+                query_vector = self._embed_user_query(user_id, query)
+                self._turn.current = (user_id, query, query_vector)
+                if first_turn:
+                    cached = self._answer_cache.get(user_id, query_vector, top_k)
+            if cached is not None:
+                logger.info(f"Answer cache hit for user_id={user_id} query='{query[:60]}'")
+                self._get_or_create_memory(user_id).save_context(
+                    {"question": query}, {"answer": cached["answer"]}
+                )
+                return cached
+                
+            # Retrieve relevant transactions on the pool while the chain (which runs its own
+            # user-restricted retrieval) makes its LLM round-trip(s) on this thread
+            pending = self._retrieval_pool.submit(
+                self.get_relevant_transactions, user_id, query, top_k, query_vector
+            )
             
             # Generate an answer
-            answer = self.generate_answer(user_id, query, matches)
+            answer = self.generate_answer(user_id, query, pending)
+            matches = pending.result()
             
             # Return both the answer and the matches for transparency
-            return {
+            result = {
                 "answer": answer,
                 "matches": matches
             }
+            if first_turn and matches and not answer.startswith(ANSWER_ERROR_PREFIX):
+                self._answer_cache.put(user_id, query, top_k, query_vector, result)
+            return result
         except Exception as e:
             logger.error(f"Error in RAG pipeline: {e}")
             return {
                 "answer": f"An error occurred while processing your question. Please try again later. Error: {str(e)[:100]}",
                 "matches": []
             }
+        finally:
+            self._turn.current = None
         
     def get_index_stats(self) -> Dict:
         """Get statistics about the current index."""
@@ -843,39 +1711,24 @@ Your response:"""
             "last_modified": None
         }
         
-        if self.vector_store is None:
-            return stats
-            
-        # Count documents and categorize
-        user_counts = {}
-        doc_types = {}
-        categories = {}
-        
-        for doc_id, doc in self.vector_store.docstore._dict.items():
-            stats["total_documents"] += 1
-            
-            user_id = doc.metadata.get("user_id")
-            if user_id:
-                user_counts[user_id] = user_counts.get(user_id, 0) + 1
-                
-            doc_type = doc.metadata.get("type")
-            if doc_type:
-                doc_types[doc_type] = doc_types.get(doc_type, 0) + 1
-                
-            category = doc.metadata.get("category")
-            if category:
-                categories[category] = categories.get(category, 0) + 1
-                
-        stats["users"] = user_counts
-        stats["document_types"] = doc_types
-        stats["categories"] = categories
+        # Counters are maintained as shards change; no docstore is walked here
+        with self._save_lock:
+            self._open_store_dir()
+            if self._counts_stale:
+                self._rescan_counts()
+            user_ids = list(self._user_counts)
+            stats["total_documents"] = sum(self._user_counts.values())
+            # The API returns user ids as string keys, the same shape JSON gives them anyway
+            stats["users"] = {str(user_id): n for user_id, n in self._user_counts.items()}
+            stats["document_types"] = dict(self._type_counts)
+            stats["categories"] = dict(self._category_counts)
         
         # Get index file size if available
-        index_path = os.path.join(VECTOR_STORE_DIR, "index.faiss")
-        if os.path.exists(index_path):
-            stats["index_size_kb"] = os.path.getsize(index_path) / 1024
+        index_paths = [path for path in (_shard_paths(user_id)[0] for user_id in user_ids) if os.path.exists(path)]
+        if index_paths:
+            stats["index_size_kb"] = sum(os.path.getsize(path) for path in index_paths) / 1024
             stats["last_modified"] = datetime.fromtimestamp(
-                os.path.getmtime(index_path)
+                max(os.path.getmtime(path) for path in index_paths)
             ).isoformat()
             
         return stats
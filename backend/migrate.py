@@ -0,0 +1,78 @@
+"""
+Applies the SQL files in backend/migrations/ that are newer than the recorded schema version.
+
+Run once per deploy, before starting the app server:
+
+    cd backend && python migrate.py
+
+and set DB_AUTO_INIT=False so app start-up skips init_db(). Files are named
+NNN_description.sql; NNN is the schema version the file brings the database to.
+"""
+
+import logging
+import os
+import re
+import sys
+
+from database import (
+    SCHEMA_VERSION,
+    get_db_connection,
+    init_db,
+    read_schema_version,
+    write_schema_version,
+)
+
+logger = logging.getLogger("migrate")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_MIGRATION_FILE = re.compile(r"^(\d+)_.+\.sql$")
+
+
+def pending_migrations(current):
+    """Return [(version, path), ...] for migration files above current, oldest first."""
+    pending = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_FILE.match(name)
+        if match and int(match.group(1)) > current:
+            pending.append((int(match.group(1)), os.path.join(MIGRATIONS_DIR, name)))
+    return sorted(pending)
+
+
+def migrate():
+    """Bring the database up to the newest migration and return the resulting version."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        current = read_schema_version(cursor)
+        if current is None:
+            cursor.execute("SHOW TABLES LIKE 'users'")
+            if cursor.fetchone():
+                # Database predates schema_meta; init_db() knows how to patch the legacy
+                # users table and records the version it reaches
+                logger.info("Unversioned database found, upgrading it with init_db()")
+                init_db()
+                current = read_schema_version(cursor)
+        current = current or 0
+
+        for version, path in pending_migrations(current):
+            logger.info(f"Applying {os.path.basename(path)}")
+            with open(path, "r") as f:
+                sql = f.read()
+            # MySQL commits DDL implicitly, so each file is recorded as soon as it succeeds
+            for _ in cursor.execute(sql, multi=True):
+                pass
+            write_schema_version(cursor, version)
+            current = version
+    finally:
+        conn.close()
+
+    if current != SCHEMA_VERSION:
+        logger.warning(f"Schema is at version {current} but database.SCHEMA_VERSION is {SCHEMA_VERSION}")
+    return current
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    version = migrate()
+    logger.info(f"Schema at version {version}")
+    sys.exit(0 if version == SCHEMA_VERSION else 1)
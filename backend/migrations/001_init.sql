@@ -0,0 +1,22 @@
+-- Base schema: users, expenses and the schema version table
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    email VARCHAR(255) UNIQUE NULL,
+    password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    date DATE,
+    category VARCHAR(255),
+    note TEXT,
+    amount DECIMAL(10,2),
+    type ENUM('Income', 'Expense'),
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+CREATE TABLE IF NOT EXISTS schema_meta (
+    `key` VARCHAR(64) PRIMARY KEY,
+    value VARCHAR(64) NOT NULL
+);
@@ -0,0 +1,2 @@
+-- Per-user history listing (WHERE user_id ORDER BY date DESC, id DESC) without a filesort
+CREATE INDEX idx_expenses_user_date ON expenses (user_id, date DESC, id DESC);
@@ -0,0 +1,2 @@
+-- Covers the forecast aggregate (monthly SUM(amount) per user for type='Expense') index-only
+CREATE INDEX idx_expenses_user_type_date ON expenses (user_id, type, date, amount);
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -21,3 +21,8 @@ class Expense(Base):
     date = Column(DateTime, default=datetime.datetime.utcnow)
 
     owner = relationship("User", back_populates="expenses")
+
+    __table_args__ = (
+        # Per-user listing ordered by id
+        Index("ix_expenses_user_id_id", "user_id", "id"),
+    )
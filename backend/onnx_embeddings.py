@@ -0,0 +1,71 @@
+"""
+Int8-quantized ONNX Runtime encoder for sentence-transformers models.
+
+Used by langchain_rag.get_embedder() when EMBEDDING_BACKEND=onnx-int8. The model is
+exported to ONNX and dynamically quantized to int8 on first use, then loaded from the
+cache directory on later starts. Requires `pip install optimum[onnxruntime]`.
+"""
+
+import logging
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("onnx_embeddings")
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+
+class ONNXInt8Embeddings(Embeddings):
+    """LangChain Embeddings backed by an int8 ONNX export of a sentence-transformers model.
+
+    Mean pooling + L2 normalization, matching sentence-transformers' defaults for the
+    MiniLM / MPNet family (and HuggingFaceEmbeddings with normalize_embeddings=True).
+    """
+
+    def __init__(self, model_name: str, cache_dir: str, batch_size: int = 64):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__") + "-int8")
+        if not os.path.exists(os.path.join(model_dir, QUANTIZED_FILE)):
+            self._export_quantized(model_name, model_dir)
+        self._model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=QUANTIZED_FILE)
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._batch_size = batch_size
+
+    @staticmethod
+    def _export_quantized(model_name: str, model_dir: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        logger.info(f"Exporting {model_name} to int8 ONNX in {model_dir} (one-time)")
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        # Dynamic quantization: weights stored as int8, activations quantized per batch
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=True)
+        ORTQuantizer.from_pretrained(model).quantize(save_dir=model_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), self._batch_size):
+            inputs = self._tokenizer(
+                texts[start:start + self._batch_size], padding=True, truncation=True, return_tensors="np"
+            )
+            hidden = self._model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        return np.vstack(batches)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from . import models, database
 from pydantic import BaseModel
@@ -6,6 +6,10 @@ from typing import List
 
 router = APIRouter(prefix="/api")
 
+# Routes stay plain `def`: FastAPI runs them in its worker threadpool, so the blocking
+# Session calls never run on the event loop. Making them `async def` around the same
+# sync Session would block the loop instead.
+
 # Pydantic schemas
 class ExpenseCreate(BaseModel):
     amount: float
@@ -19,13 +23,22 @@ class ExpenseOut(ExpenseCreate):
     class Config:
         orm_mode = True
 
-@router.get("/expenses", response_model=List[ExpenseOut])
-def list_expenses(db: Session = Depends(database.get_db)):
-    return db.query(models.Expense).all()
+@router.get("/users/{user_id}/expenses", response_model=List[ExpenseOut])
+def list_expenses(user_id: int, limit: int = Query(100, ge=1, le=500), offset: int = Query(0, ge=0),
+                  db: Session = Depends(database.get_db)):
+    # One page of one user's expenses, newest first; served by ix_expenses_user_id_id
+    return (
+        db.query(models.Expense)
+        .filter_by(user_id=user_id)
+        .order_by(models.Expense.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
 
-@router.post("/expenses", response_model=ExpenseOut)
-def create_expense(expense: ExpenseCreate, db: Session = Depends(database.get_db)):
-    db_exp = models.Expense(**expense.dict(), user_id=1)
+@router.post("/users/{user_id}/expenses", response_model=ExpenseOut)
+def create_expense(user_id: int, expense: ExpenseCreate, db: Session = Depends(database.get_db)):
+    db_exp = models.Expense(**expense.dict(), user_id=user_id)
     db.add(db_exp)
     db.commit()
     db.refresh(db_exp)
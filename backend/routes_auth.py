@@ -0,0 +1,253 @@
+"""
+Account routes for BudgetWise: signup, login and the current user's profile.
+Registered on the Flask app as the "auth" blueprint.
+"""
+
+import logging
+import re
+import threading
+
+import bcrypt  # Legacy verification only
+import mysql.connector
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError, VerificationError, InvalidHashError
+from cachetools import TTLCache
+from flask import Blueprint, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required
+from werkzeug.security import check_password_hash  # Legacy verification only
+
+from config import SETTINGS
+from database import get_db_connection, prepared_cursor
+from schemas import SIGNUP_DECODER, LOGIN_DECODER, decode_payload
+
+logger = logging.getLogger("api")
+
+bp = Blueprint("auth", __name__)
+
+# Password validation function
+def validate_password(password):
+    """
+    Validate password requirements:
+    - At least 1 lowercase letter
+    - At least 1 uppercase letter  
+    - At least 1 digit
+    - At least 1 special character (@$!%*?&#^()[ ]{}_-+=~|:;,.<>)
+    """
+    if not password:
+        return "Password is required"
+    
+    # Check for at least one lowercase letter
+    if not re.search(r'[a-z]', password):
+        return "Password must contain at least one lowercase letter"
+    
+    # Check for at least one uppercase letter
+    if not re.search(r'[A-Z]', password):
+        return "Password must contain at least one uppercase letter"
+    
+    # Check for at least one digit
+    if not re.search(r'\d', password):
+        return "Password must contain at least one digit"
+    
+    # Check for at least one special character
+    if not re.search(r'[@$!%*?&#^()\[\]{}_\-+=~|:;,.<>]', password):
+        return "Password must contain at least one special character (@$!%*?&#^()[ ]{}_-+=~|:;,.<>)"
+    
+    return None  # No validation errors
+
+# Argon2id hasher for new passwords; bcrypt and PBKDF2 hashes are verified for legacy accounts
+ph = PasswordHasher(
+    time_cost=SETTINGS.argon2_time_cost,
+    memory_cost=SETTINGS.argon2_memory_cost,
+    parallelism=SETTINGS.argon2_parallelism,
+)
+
+def current_uid():
+    """Authenticated user id, read from the integer "uid" claim of the decoded JWT."""
+    uid = get_jwt().get("uid")
+    if uid is None:
+        # Tokens issued before the uid claim carry only the string identity
+        return int(get_jwt_identity())
+    return uid
+
+SIGNUP_USER_SQL = "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)"
+
+# --- Signup ---
+@bp.route("/signup", methods=["POST"])
+def signup():
+    data, error = decode_payload(SIGNUP_DECODER)
+    if error:
+        return error
+    username = (data.username or '').strip()
+    email = (data.email or '').strip().lower()
+    password = data.password or ''
+
+    if not username or not email or not password:
+        return jsonify({"message": "Missing required fields"}), 400
+
+    # Validate password requirements
+    password_error = validate_password(password)
+    if password_error:
+        return jsonify({"message": password_error}), 400
+
+    # Hash password using Argon2id. Legacy users keep bcrypt/PBKDF2 hashes until next login.
+    hashed_password = ph.hash(password)
+
+    conn = get_db_connection()
+    try:
+        # Duplicate username/email is rejected by the unique keys (IntegrityError -> 409).
+        # Insert with email if column exists; fallback if migration not yet added
+        try:
+            with prepared_cursor(conn, SIGNUP_USER_SQL) as cursor:
+                cursor.execute(SIGNUP_USER_SQL, (username, email, hashed_password))
+        except mysql.connector.ProgrammingError:
+            # email column absent (very early schema) -> add user without email
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
+        with _unknown_user_lock:
+            _unknown_user_cache.pop(_username_key(username), None)
+        return jsonify({"message": "Signup successful"}), 201
+    except mysql.connector.IntegrityError:
+        return jsonify({"message": "User already exists"}), 409
+    except Exception as e:
+        return jsonify({"message": "Signup failed", "error": str(e)}), 500
+    finally:
+        conn.close()
+
+def _rehash_password(user_id, password):
+    """Upgrade a legacy or outdated hash to the current Argon2id parameters."""
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET password=%s WHERE id=%s", (ph.hash(password), user_id))
+        finally:
+            conn.close()
+        logger.info(f"Password hash upgraded to Argon2id for user_id={user_id}")
+    except Exception:
+        # Login must not fail because the opportunistic upgrade did
+        logger.exception(f"Password rehash failed for user_id={user_id}")
+
+# Column order of the prepared (tuple-returning) login SELECT
+LOGIN_USER_COLS = ("id", "username", "email", "password")
+LOGIN_USER_SQL = "SELECT id, username, email, password FROM users WHERE username=%s"
+
+# Negative cache of usernames with no account, so invalid-username floods skip the DB.
+# Keyed by _username_key, so every spelling the database would match shares one entry.
+_unknown_user_cache = TTLCache(maxsize=10000, ttl=30)
+_unknown_user_lock = threading.Lock()
+
+def _username_key(username):
+    """Negative-cache key: stripped and lowercased, as the users.username collation compares."""
+    return username.strip().lower()
+
+# Verified against on the unknown-user path to equalize login timing
+_DUMMY_HASH = ph.hash("budgetwise-timing-equalizer")
+
+# --- Login ---
+@bp.route("/login", methods=["POST"])
+def login():
+    data, error = decode_payload(LOGIN_DECODER)
+    if error:
+        return error
+    # Stripped like signup, so " bob" finds the account created as "bob"
+    username = (data.username or '').strip()
+    password = data.password
+    
+    if not username or not password:
+        logger.warning("Login attempt with missing fields")
+        return jsonify({"message": "Missing required fields"}), 400
+    
+    # Usernames that recently missed are answered without touching the DB
+    cache_key = _username_key(username)
+    with _unknown_user_lock:
+        known_unknown = cache_key in _unknown_user_cache
+    user = None
+    if not known_unknown:
+        conn = get_db_connection()
+        try:
+            with prepared_cursor(conn, LOGIN_USER_SQL) as cursor:
+                cursor.execute(LOGIN_USER_SQL, (username,))
+                # At most one row; read to the end so the pooled connection goes back with
+                # no unread result for the statement's next checkout
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+        user = dict(zip(LOGIN_USER_COLS, rows[0])) if rows else None
+        if user is None:
+            with _unknown_user_lock:
+                _unknown_user_cache[cache_key] = True
+
+    if user is None:
+        # Spend the same hashing time as a real check so response timing does not reveal
+        # whether the username exists
+        try:
+            ph.verify(_DUMMY_HASH, password)
+        except VerificationError:
+            pass
+    else:
+        stored_hash = user["password"] or ""
+        valid = False
+        needs_rehash = False
+        if stored_hash.startswith("$argon2"):
+            try:
+                valid = ph.verify(stored_hash, password)
+                needs_rehash = ph.check_needs_rehash(stored_hash)
+            except (VerifyMismatchError, VerificationError, InvalidHashError):
+                valid = False
+        # Detect bcrypt hash prefixes
+        elif stored_hash.startswith(("$2a$", "$2b$", "$2y$")):
+            try:
+                valid = bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+            except ValueError:
+                valid = False
+            needs_rehash = valid
+        else:
+            # Fallback to Werkzeug PBKDF2 check for legacy accounts
+            try:
+                valid = check_password_hash(stored_hash, password)
+            except Exception:
+                valid = False
+            needs_rehash = valid
+
+        if valid:
+            if needs_rehash:
+                _rehash_password(user["id"], password)
+            logger.info(f"Login successful for user_id={user['id']} username={user['username']}")
+            access_token = create_access_token(identity=str(user["id"]), additional_claims={"uid": user["id"]})
+            return jsonify({
+                "message": "Login successful",
+                "access_token": access_token,
+                "user_id": user["id"],
+                "username": user["username"],
+                "email": user["email"]
+            })
+    logger.warning(f"Invalid login for username={username}")
+    return jsonify({"message": "Invalid credentials"}), 401
+
+# --- Get User Info ---
+# Profile rows rarely change but are fetched on every page load; serve repeats from memory
+_user_cache = TTLCache(maxsize=10000, ttl=60)
+_user_cache_lock = threading.Lock()
+
+@bp.route("/user", methods=["GET"])
+@jwt_required()
+def get_user_info():
+    current_user_id = current_uid()
+
+    with _user_cache_lock:
+        user = _user_cache.get(current_user_id)
+    if user is not None:
+        return jsonify(user)
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, username, email, created_at FROM users WHERE id=%s", (current_user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    with _user_cache_lock:
+        _user_cache[current_user_id] = user
+    return jsonify(user)
@@ -0,0 +1,62 @@
+"""
+Request payload schemas for the BudgetWise API.
+msgspec builds a specialized decoder per struct, so a JSON body is parsed and
+validated in a single C pass instead of json.loads + per-field dict lookups.
+Large list responses are encoded from structs the same way.
+"""
+
+from decimal import Decimal
+from typing import List, Literal, Optional
+
+import msgspec
+from flask import jsonify, request
+
+
+class SignupIn(msgspec.Struct):
+    username: Optional[str] = None
+    email: Optional[str] = None
+    password: Optional[str] = None
+
+
+class LoginIn(msgspec.Struct):
+    username: Optional[str] = None
+    password: Optional[str] = None
+
+
+class ExpenseIn(msgspec.Struct):
+    date: str
+    category: str
+    amount: float
+    type: Literal["Income", "Expense"]
+    # Optional in the form; null and a missing key both decode to None
+    note: Optional[str] = None
+    user_id: Optional[int] = None
+
+
+class ExpenseOut(msgspec.Struct):
+    """One row of the GET /expenses listing, fields in the SELECT's column order."""
+    id: int
+    date: str
+    category: Optional[str]
+    note: Optional[str]
+    amount: Decimal  # encoded as a string, e.g. "12.50", as the JSON provider does
+    type: str
+
+
+# Decoders are compiled once; strict=False keeps accepting numeric strings (e.g. "12.50")
+SIGNUP_DECODER = msgspec.json.Decoder(SignupIn, strict=False)
+LOGIN_DECODER = msgspec.json.Decoder(LoginIn, strict=False)
+EXPENSE_DECODER = msgspec.json.Decoder(ExpenseIn, strict=False)
+BULK_EXPENSE_DECODER = msgspec.json.Decoder(List[ExpenseIn], strict=False)
+EXPENSE_LIST_ENCODER = msgspec.json.Encoder()
+
+
+def decode_payload(decoder):
+    """Decode the request body with a precompiled msgspec decoder.
+
+    Returns (payload, None) on success or (None, error_response) for a malformed body.
+    """
+    try:
+        return decoder.decode(request.get_data()), None
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        return None, (jsonify({"message": "Invalid request payload", "error": str(e)}), 400)